@@ -1,45 +1,231 @@
-"""This file will contain the backend of the 'Guess the Player' game."""
+"""This file will contain the backend of the 'Guess the Player' game.
+
+Importing this file is kept cheap, so the game's window can open straight away: the player data is only loaded the
+first time it's needed (see load_player_data()), and requests/nba_api/pandas are only imported by the functions
+that use them.
+"""
 
-import requests
 import random
-from typing import Optional
-from nba_api.stats.static import players
-from nba_api.stats.endpoints import playercareerstats, leagueleaders
-import json
+import numpy as np
+from typing import Optional, Sequence
 import os
+import queue
+import threading
+import time
 from Installer import get_file_path
+from Cache import HeadshotCache, CareerStore
+from Tracing import span, begin_question, end_question
+from PlayerData import PlayerTable, ACTIVE_FLAG, ALL_PLAYERS, load_players, load_pool, load_playable_manifest
 
 
 # Public variables
-# Generates a list[dict] of active and all players respectively
-all_players = players.get_players()
-invalid_ids = set()     # Set of player IDs that return an invalid headshot
+HEADSHOT_URL = 'https://cdn.nba.com/headshots/nba/latest/260x190/{player_id}.png'
+
+# Runs the game against Replay.py's local stand-in for the NBA's servers (e.g. HOOPSTER_STAND_IN=http://127.0.0.1:8765)
+if os.environ.get("HOOPSTER_STAND_IN"):
+    from Replay import use_stand_in
+    HEADSHOT_URL = use_stand_in(os.environ["HOOPSTER_STAND_IN"])
+
+# Seconds to wait for the connection to the NBA's site, and then for each chunk of its response
+HEADSHOT_TIMEOUT = (3.05, 10)
+
+# Headshots smaller than this many bytes are blank placeholder images
+PLACEHOLDER_BYTES = 5000
+
+# Connections kept open to the NBA's site (enough for the prefetch threads, or Server.py's fetch threads)
+HTTP_POOL_SIZE = 16
+
+http_session = None     # The shared requests.Session (see get_http_session())
+http_session_lock = threading.Lock()
+
+# The on-disk caches, which are opened by get_headshot_cache() & get_career_store() the first time they're needed
+headshot_cache: HeadshotCache   # Headshots (and placeholder IDs) saved by previous sessions
+career_store: CareerStore       # Career totals fetched by previous sessions (used to categorize players)
+caches_lock = threading.Lock()
+
+invalid_ids = set()     # Set of player IDs that return an invalid headshot (filled in by load_player_data())
 used_players = set()    # Player IDs that have already been used
 
+# Number of ready-to-play questions kept warm for each mode by the prefetch threads
+PREFETCH_DEPTH = 3
+
+# Number of failed fetches in a row before a prefetch thread passes the error on to the game (e.g. there's no network)
+PREFETCH_MAX_FAILURES = 3
+
+# Queues of prepared questions (tuple of (NBAPlayer, options)) for each mode
+# These stay empty until start_prefetching() is called
+prefetch_queues = {'casual': queue.Queue(maxsize=PREFETCH_DEPTH), 'diehard': queue.Queue(maxsize=PREFETCH_DEPTH)}
+prefetch_threads = []
+
+# Guards 'used_players', 'invalid_ids' & the decks, since the prefetch threads draw players at the same time
+pool_lock = threading.Lock()
+
+
+# The player data, which is loaded by load_player_data() the first time it's needed
+casual_data: Sequence[dict]     # A PlayerTable, or a list of dicts if the pool hasn't been compiled
+diehard_data: Sequence[dict]
+player_registry: "PlayerRegistry"
+decks: dict
+player_data_loaded = False
+player_data_lock = threading.Lock()
+
+
+class PlayerRegistry:
+    """A compact registry of every NBA player (~5,000 of them), from nba_api's list of player dicts.
+
+    Instead of a dict per player, each field is stored in its own array (sorted by player ID, which roughly follows
+    when players entered the league). The names are stored as one long string of UTF-8 bytes: player i's full, first &
+    last names are names[offsets[3i]:offsets[3i + 1]], names[offsets[3i + 1]:offsets[3i + 2]] & names[offsets[3i + 2]:offsets[3i + 3]].
+    When 'Datasets/all_players.bin' exists, the arrays are memory-mapped straight out of it (see PlayerData.py).
+    """
+
+    ids: np.ndarray         # Sorted player IDs
+    is_active: np.ndarray
+    offsets: np.ndarray     # Where each player's names start (and end) in 'names'
+    names: bytes            # (or a memoryview of the .bin file)
+    extra_players: list     # Dicts of players that aren't in nba_api's list (their positions come after the arrays)
+    extra_positions: dict   # Player ID -> position of each of the extra players
+    candidates: dict        # Active filter (None, True or False) -> positions of the players that pass it
+    lock: threading.Lock    # Makes registering an extra player one step, since the prefetch threads add players at once
+
+    def __init__(self, ids: np.ndarray, is_active: np.ndarray, offsets: np.ndarray, names):
+        self.ids = ids
+        self.is_active = is_active
+        self.offsets = offsets
+        self.names = names
+
+        self.extra_players = []
+        self.extra_positions = {}
+        self.lock = threading.Lock()
+
+        self.candidates = {None: np.arange(len(self.ids)),
+                           True: np.flatnonzero(self.is_active),
+                           False: np.flatnonzero(~self.is_active)}
+
+    @classmethod
+    def from_dicts(cls, player_dicts: list[dict]) -> "PlayerRegistry":
+        """Build the registry from a list of player dicts (e.g. nba_api's players.get_players())."""
+
+        sorted_players = sorted(player_dicts, key=lambda player_dict: player_dict['id'])
+
+        name_fields = [player_dict[field].encode('utf-8') for player_dict in sorted_players
+                       for field in ('full_name', 'first_name', 'last_name')]
+        offsets = np.zeros(len(name_fields) + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(name) for name in name_fields])
+
+        return cls(np.array([player_dict['id'] for player_dict in sorted_players], dtype=np.int32),
+                   np.array([player_dict['is_active'] for player_dict in sorted_players], dtype=bool),
+                   offsets, b''.join(name_fields))
+
+    @classmethod
+    def from_table(cls, table: PlayerTable) -> "PlayerRegistry":
+        """Build the registry from a memory-mapped dataset (the IDs, offsets & names aren't copied)."""
+
+        return cls(table.ids, (table.flags & ACTIVE_FLAG).astype(bool), table.offsets, table.names)
+
+    def position(self, player_id: int) -> Optional[int]:
+        """Return the position of the player with the given ID, or None if they aren't registered."""
+
+        # The IDs are sorted, so a binary search finds the player without needing a dict of every ID
+        position = int(np.searchsorted(self.ids, player_id))
+
+        if position < len(self.ids) and self.ids[position] == player_id:
+            return position
 
-# Loading the JSON files containing player data
-with open(get_file_path(os.path.join('Datasets', 'casual_players.json')), 'r') as file1:
-    casual_data = json.load(file1)
+        return self.extra_positions.get(player_id)
 
-with open(get_file_path(os.path.join('Datasets', 'diehard_players.json')), 'r') as file2:
-    diehard_data = json.load(file2)
+    def add(self, player_dict: dict) -> int:
+        """Return the position of the given player, registering them first if nba_api's list doesn't have them."""
+
+        position = self.position(player_dict['id'])
+
+        if position is not None:
+            return position
+
+        # Checked again under the lock, in case another thread registered the same player in the meantime
+        with self.lock:
+            position = self.position(player_dict['id'])
+
+            if position is None:
+                position = len(self.ids) + len(self.extra_players)
+                self.extra_players.append(player_dict)
+                self.extra_positions[player_dict['id']] = position
+
+        return position
+
+    def field(self, position: int, field: int) -> str:
+        """Return one of the names of the player at the given position (0 = full, 1 = first, 2 = last)."""
+
+        if position >= len(self.ids):
+            return self.extra_players[position - len(self.ids)][('full_name', 'first_name', 'last_name')[field]]
+
+        return str(self.names[self.offsets[3 * position + field]:self.offsets[3 * position + field + 1]], 'utf-8')
+
+    def player_id(self, position: int) -> int:
+        """Return the ID of the player at the given position."""
+
+        if position >= len(self.ids):
+            return self.extra_players[position - len(self.ids)]['id']
+
+        return int(self.ids[position])
+
+    def full_name(self, position: int) -> str:
+        """Return the full name of the player at the given position."""
+
+        return self.field(position, 0)
+
+    def player_dict(self, position: int) -> dict:
+        """Return the player at the given position as a dict, in the same format as nba_api's list."""
+
+        if position >= len(self.ids):
+            return self.extra_players[position - len(self.ids)]
+
+        return {'id': int(self.ids[position]), 'full_name': self.field(position, 0), 'first_name': self.field(position, 1),
+                'last_name': self.field(position, 2), 'is_active': bool(self.is_active[position])}
 
 
 class NBAPlayer:
-    """Python class for an NBA player."""
+    """Python class for an NBA player, which is a lightweight view of their entry in the player registry."""
 
-    id: int
-    full_name: str
-    first_name: str
-    last_name: str
-    category: Optional[str]
+    __slots__ = ('position', 'headshot', '_category', '_is_categorized')
+
+    position: int
+    headshot: Optional[bytes]
 
     def __init__(self, player_dict: dict):
-        self.id = player_dict['id']
-        self.full_name = player_dict['full_name']
-        self.first_name = player_dict['first_name']
-        self.last_name = player_dict['last_name']
-        self.category = self.categorize_player()
+        load_player_data()
+        self.position = player_registry.add(player_dict)
+        self.headshot = None    # PNG bytes of the player's headshot, filled in by get_player()
+
+        # The category is only worked out the first time it's used, since it needs the player's career stats
+        self._category = None
+        self._is_categorized = False
+
+    @property
+    def id(self) -> int:
+        return player_registry.player_id(self.position)
+
+    @property
+    def full_name(self) -> str:
+        return player_registry.field(self.position, 0)
+
+    @property
+    def first_name(self) -> str:
+        return player_registry.field(self.position, 1)
+
+    @property
+    def last_name(self) -> str:
+        return player_registry.field(self.position, 2)
+
+    @property
+    def category(self) -> Optional[str]:
+        """Return the player's category, categorizing them on first access."""
+
+        if not self._is_categorized:
+            self._category = self.categorize_player()
+            self._is_categorized = True
+
+        return self._category
 
     # We're abandoning this method FOR NOW
     # def get_nickname(self) -> Optional[str]:
@@ -70,91 +256,488 @@ class NBAPlayer:
     def categorize_player(self) -> Optional[str]:
         """Return whether the NBA player's level is CASUAL, DIEHARD, or None."""
 
-        career = playercareerstats.PlayerCareerStats(player_id=self.id)   # Fetching player's career stats
-        table = career.get_data_frames()[0]     # Transforming the data into a readable table
+        with span("categorize_player"):
+            career_totals = get_career_totals(self.id)
 
-        # Return None if the dataframe is empty (e.g. the player didn't play any official games)
-        if table.empty:
+        # Return None if the player didn't play any official games
+        if career_totals is None:
             return None
 
-        # Calculate the player's career PPG
-        total_points = table['PTS'].sum()
-        total_games = table['GP'].sum()
-
-        # Get the last season of the player
-        # [:4] only takes the first 4 characters (e.g. '1995-96' would be counted as '1995')
-        last_season = int(table['SEASON_ID'].iloc[-1][:4])
-
-        if total_games > 0:
-            career_ppg = total_points / total_games
-        else:
-            career_ppg = 0
+        is_casual, is_diehard = category_rules(*career_totals)
 
-        if (last_season > 1995 and career_ppg > 18) or (last_season > 2015 and total_games > 1200):
+        if is_casual:
             return "casual"
 
-        elif last_season > 2015 and career_ppg < 8 and total_games >= 82:
+        elif is_diehard:
             return "diehard"
 
         else:
             return None
 
 
+def category_rules(total_points, total_games, last_season) -> tuple:
+    """Return whether a player is CASUAL & whether they're DIEHARD, based on their career totals (CASUAL wins if both).
+
+    Works on single numbers, or on NumPy arrays/pandas columns of every player at once (see Rebuild.categorize_players()).
+    """
+
+    # Calculate the player's career PPG (a player without any games doesn't have any points either)
+    career_ppg = total_points / np.maximum(total_games, 1)
+
+    # '&' and '|' instead of 'and' and 'or', since they also work element by element on arrays
+    is_casual = ((last_season > 1995) & (career_ppg > 18)) | ((last_season > 2015) & (total_games > 1200))
+    is_diehard = (last_season > 2015) & (career_ppg < 8) & (total_games >= 82)
+
+    return is_casual, is_diehard
+
+
+class PlayerDeck:
+    """A shuffled deck of the UNIQUE players in a pool, which are dealt one at a time without replacement.
+
+    Once every player has been dealt, the deck is reshuffled & dealt again (never starting with the last player dealt).
+    """
+
+    players: list[dict]     # The pool's players, with duplicates & invalid IDs removed
+    order: list[int]        # Shuffled indices into 'players' (the first 'cursor' of them have already been dealt)
+    positions: dict         # Player ID -> position of the player in 'order'
+    cursor: int
+
+    def __init__(self, pool: list[dict], excluded_ids: set[int]):
+        # The JSON files list some players more than once (e.g. a player who led the league for many seasons)
+        unique_players = {}
+        for player_dict in pool:
+            if player_dict['id'] not in excluded_ids:
+                unique_players.setdefault(player_dict['id'], player_dict)
+
+        self.players = list(unique_players.values())
+        self.order = list(range(len(self.players)))
+        random.shuffle(self.order)
+        self.positions = {self.players[index]['id']: position for position, index in enumerate(self.order)}
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def remaining(self) -> int:
+        """Return the number of players that haven't been dealt since the last shuffle."""
+
+        return len(self.order) - self.cursor
+
+    def swap(self, i: int, j: int) -> None:
+        """Swap two positions in the deck's order."""
+
+        self.order[i], self.order[j] = self.order[j], self.order[i]
+        self.positions[self.players[self.order[i]]['id']] = i
+        self.positions[self.players[self.order[j]]['id']] = j
+
+    def reshuffle(self) -> None:
+        """Shuffle every player back into the deck."""
+
+        last_dealt = self.order[-1] if self.order else None
+        random.shuffle(self.order)
+
+        # Making sure the last player of the previous round isn't dealt twice in a row
+        if len(self.order) > 1 and self.order[0] == last_dealt:
+            self.order[0], self.order[-1] = self.order[-1], self.order[0]
+
+        self.positions = {self.players[index]['id']: position for position, index in enumerate(self.order)}
+        self.cursor = 0
+
+    def draw(self) -> dict:
+        """Return the dict of the next player in the deck, reshuffling the deck if every player was dealt."""
+
+        if not self.order:
+            raise ValueError("Every player in this pool has an invalid headshot.")
+
+        if self.cursor == len(self.order):
+            self.reshuffle()
+
+        player_dict = self.players[self.order[self.cursor]]
+        self.cursor += 1
+        return player_dict
+
+    def put_back(self, player_id: int) -> None:
+        """Return a dealt player to the deck, as the next player to be dealt."""
+
+        position = self.positions.get(player_id)
+        if position is None or position >= self.cursor:
+            return
+
+        self.cursor -= 1
+        self.swap(position, self.cursor)
+
+    def remove(self, player_id: int) -> None:
+        """Take a player out of the deck for good (e.g. because their headshot is invalid)."""
+
+        position = self.positions.pop(player_id, None)
+        if position is None:
+            return
+
+        # Keeping the dealt players in front of the cursor, by first moving the removed player to the cursor's edge
+        if position < self.cursor:
+            self.cursor -= 1
+            self.swap(position, self.cursor)
+            position = self.cursor
+
+        # Moving the removed player to the end of the deck, so they can be popped off in O(1)
+        last = len(self.order) - 1
+        if position != last:
+            self.swap(position, last)
+
+        self.order.pop()
+        self.positions.pop(player_id, None)
+
+
+def load_player_data() -> None:
+    """Load the JSON files containing player data, the player registry & the decks (only the first time it's called)."""
+
+    global casual_data, diehard_data, player_registry, decks, player_data_loaded
+
+    # Checked without the lock first, since this is called for every player
+    if player_data_loaded:
+        return
+
+    with player_data_lock:
+        if player_data_loaded:
+            return
+
+        # The compiled .bin files are memory-mapped if they exist, falling back to the JSON files (see PlayerData.py)
+        casual_data = load_pool('casual')
+        diehard_data = load_pool('diehard')
+
+        # Generates the registry of ALL players
+        all_players = load_players(ALL_PLAYERS)
+
+        if all_players is not None:
+            player_registry = PlayerRegistry.from_table(all_players)
+
+        else:
+            # nba_api's list of dicts is only kept while the registry is built
+            from nba_api.stats.static import players
+            player_registry = PlayerRegistry.from_dicts(players.get_players())
+
+        # Players found to have a placeholder headshot by a previous session, or by Validate.py, are never dealt
+        # (players Validate.py hasn't checked, e.g. ones Rebuild.py added since, are still checked when they're drawn)
+        manifest = load_playable_manifest()
+
+        with pool_lock:
+            invalid_ids.update(get_headshot_cache().invalid_ids())
+
+            if manifest is not None:
+                invalid_ids.update(manifest['placeholder'])
+
+        # A deck for each mode, built from the pools' unique players (minus the ones known to have invalid headshots)
+        decks = {'casual': PlayerDeck(casual_data, invalid_ids), 'diehard': PlayerDeck(diehard_data, invalid_ids)}
+
+        player_data_loaded = True
+
+
+def get_headshot_cache() -> HeadshotCache:
+    """Return the headshot cache, opening it (and creating its folder) the first time it's needed."""
+
+    global headshot_cache
+
+    # Checked without the lock first, since this is called for every headshot
+    if 'headshot_cache' not in globals():
+        with caches_lock:
+            if 'headshot_cache' not in globals():
+                headshot_cache = HeadshotCache()
+
+    return headshot_cache
+
+
+def get_career_store() -> CareerStore:
+    """Return the career store, reading it from disk the first time it's needed."""
+
+    global career_store
+
+    if 'career_store' not in globals():
+        with caches_lock:
+            if 'career_store' not in globals():
+                career_store = CareerStore()
+
+    return career_store
+
+
+def __getattr__(name: str):
+    """Load the player data (or open a cache) when another file asks for it (e.g. Backend.casual_data) before it was
+    loaded."""
+
+    if name in {'casual_data', 'diehard_data', 'player_registry', 'decks'}:
+        load_player_data()
+        return globals()[name]
+
+    if name == 'headshot_cache':
+        return get_headshot_cache()
+
+    if name == 'career_store':
+        return get_career_store()
+
+    raise AttributeError(f"module 'Backend' has no attribute '{name}'")
+
+
+def get_career_totals(player_id: int) -> Optional[list[int]]:
+    """Return a player's [total points, total games, last season], or None if they never played an official game."""
+
+    # Checking if the totals were already fetched (in this session or a previous one)
+    if player_id in get_career_store():
+        return get_career_store().get(player_id)
+
+    from nba_api.stats.endpoints import playercareerstats
+
+    career = playercareerstats.PlayerCareerStats(player_id=player_id)   # Fetching player's career stats
+    table = career.get_data_frames()[0]     # Transforming the data into a readable table
+
+    # The dataframe is empty if the player didn't play any official games
+    if table.empty:
+        career_totals = None
+
+    else:
+        # Get the last season of the player
+        # [:4] only takes the first 4 characters (e.g. '1995-96' would be counted as '1995')
+        # int() turns NumPy's integers into regular ones, so the totals can be stored as JSON
+        career_totals = [int(table['PTS'].sum()), int(table['GP'].sum()), int(table['SEASON_ID'].iloc[-1][:4])]
+
+    get_career_store().put(player_id, career_totals)
+    return career_totals
+
+
 def get_player(mode: str) -> NBAPlayer:
     """Return an NBAPlayer instance of a random player, based on whether the user selected CASUAL or DIEHARD."""
 
+    load_player_data()
+
     while True:
 
-        # From the JSON files containing CASUAL or DIEHARD players, this randomly selects a dict representing a
+        with span("draw_player"), pool_lock:
+            random_player = draw_unused_player(decks, used_players, mode)
+
+        curr_player = NBAPlayer(random_player)
+
+        # Automatically fetches the player's headshot
+        # If the headshot isn't valid, try again
+        try:
+            with span("fetch_headshot", player_id=curr_player.id):
+                headshot = fetch_headshot(curr_player.id)
+
+        # The player was never shown, so they go back in the deck (otherwise an outage would use up the whole deck)
+        except Exception:
+            with pool_lock:
+                release_player(decks, used_players, mode, curr_player.id)
+            raise
+
+        if headshot is not None:
+            curr_player.headshot = headshot
+            return curr_player
+
+        with pool_lock:
+            discard_invalid_player(decks, used_players, curr_player.id)
+
+
+def draw_unused_player(player_decks: dict[str, PlayerDeck], used: set[int], mode: str) -> dict:
+    """Deal the next player from the mode's deck who isn't in 'used', and add them to 'used'.
+
+    The game's decks & used players are shared by the prefetch threads, so get_player() holds 'pool_lock' around this.
+    """
+
+    while True:
+        deck = player_decks[mode]
+
+        # Once the deck runs out, its players become available again
+        if deck.remaining() == 0:
+            used.difference_update(player_dict['id'] for player_dict in deck.players)
+
+        # Dealing the next CASUAL or DIEHARD player from the deck, as a dict representing a
         # SINGLE player (e.g. {'id': ..., 'full_name': ..., ...})
-        if mode == "casual":
-            random_player = random.choice(casual_data)
-        else:
-            random_player = random.choice(diehard_data)
+        random_player = deck.draw()
 
-        # Checking if the player was already USED or their headshot was INVALID
-        if random_player['id'] in invalid_ids or random_player['id'] in used_players:
+        # Another set of decks may have found out that the player's headshot is invalid
+        if random_player['id'] in invalid_ids:
+            deck.remove(random_player['id'])
             continue
 
-        curr_player = NBAPlayer(random_player)
+        # A few players are in BOTH pools, so they may have already been used in the other mode
+        if random_player['id'] in used:
+            continue
 
-        # Automatically downloads the player's headshot
-        # If the headshot isn't downloaded, try again
-        if download_headshot(curr_player.id):
-            used_players.add(curr_player.id)
-            return curr_player
-        else:
-            invalid_ids.add(curr_player.id)
+        # Reserving the player straight away, so another prefetch thread can't pick them too
+        used.add(random_player['id'])
+        return random_player
+
+
+def release_player(player_decks: dict[str, PlayerDeck], used: set[int], mode: str, player_id: int) -> None:
+    """Undo draw_unused_player() for a player who couldn't be shown (e.g. their headshot didn't download)."""
+
+    used.discard(player_id)
+    player_decks[mode].put_back(player_id)
+
+
+def discard_invalid_player(player_decks: dict[str, PlayerDeck], used: set[int], player_id: int) -> None:
+    """Take a player whose headshot is invalid out of every deck."""
+
+    used.discard(player_id)
+    invalid_ids.add(player_id)
+
+    # The player can't be used in either mode
+    for deck in player_decks.values():
+        deck.remove(player_id)
+
+
+# Number of extra names drawn per question, so a few repeated names don't force a second draw
+OPTIONS_SLACK = 3
+
+options_rng = np.random.default_rng()
+
+
+def get_options_batch(curr_names: list[str], player_ids: Optional[list[int]] = None, era_window: Optional[int] = None,
+                      active: Optional[bool] = None) -> list[list[str]]:
+    """Return a list of 4 UNIQUE options for each of the given questions, drawing all the wrong options at once.
+
+    If 'era_window' is given, the wrong options are drawn from the 'era_window' players on either side of each
+    player's ID (which needs 'player_ids'). If 'active' is True/False, only active/retired players are drawn.
+    """
+
+    load_player_data()
+
+    candidates = player_registry.candidates[active]
+    num_draws = 3 + OPTIONS_SLACK
+
+    if era_window is None:
+        # Every question draws from all the candidates
+        low = np.zeros(len(curr_names), dtype=np.int64)
+        high = np.full(len(curr_names), len(candidates), dtype=np.int64)
+
+    else:
+        # Each question draws from the candidates whose position is within 'era_window' of the player's
+        positions = np.searchsorted(player_registry.ids, np.asarray(player_ids, dtype=np.int32))
+        low = np.searchsorted(candidates, positions - era_window)
+        high = np.searchsorted(candidates, positions + era_window + 1)
+
+        # Falling back to all the candidates if the window doesn't hold enough of them (e.g. no active players in 1990)
+        too_narrow = high - low < 4
+        low[too_narrow] = 0
+        high[too_narrow] = len(candidates)
 
+    # One draw for every question: row q holds the positions (in 'candidates') of question q's wrong options
+    draws = low[:, None] + (options_rng.random((len(curr_names), num_draws)) * (high - low)[:, None]).astype(np.int64)
+    drawn_positions = candidates[np.minimum(draws, len(candidates) - 1)]
 
-def get_options(curr_name: str) -> list[str]:
+    all_options = []
+    for question, curr_name in enumerate(curr_names):
+        options = [curr_name]
+
+        for position in drawn_positions[question]:
+            name = player_registry.full_name(position)
+            if name not in options:
+                options.append(name)
+            if len(options) == 4:
+                break
+
+        # In the rare case the draw didn't have enough unique names, keep drawing one at a time
+        while len(options) < 4:
+            name = player_registry.full_name(candidates[options_rng.integers(low[question], high[question])])
+            if name not in options:
+                options.append(name)
+
+        random.shuffle(options)     # Shuffle the order of the options
+        all_options.append(options)
+
+    return all_options
+
+
+def get_options(curr_name: str, player_id: Optional[int] = None, era_window: Optional[int] = None,
+                active: Optional[bool] = None) -> list[str]:
     """Return a list of 4 UNIQUE options for each question."""
 
-    options = [curr_name]
+    player_ids = None if player_id is None else [player_id]
+    return get_options_batch([curr_name], player_ids, era_window, active)[0]
 
-    # Keep adding players' names to the list until we have 4 options
-    while len(options) < 4:
-        random_choice = random.choice(all_players)
-        if random_choice['full_name'] not in options:
-            options.append(random_choice['full_name'])
 
-    random.shuffle(options)     # Shuffle the order of the options
-    return options
+def get_http_session():
+    """Return the requests.Session shared by every headshot download, creating it the first time.
 
+    The session keeps its connections to the NBA's site open, so only the first request pays for the TCP & TLS handshakes.
+    """
 
-def download_headshot(player_id: int) -> bool:
-    """Downloading an image of a player's headshot, based on their ID."""
+    global http_session
 
-    url = f'https://cdn.nba.com/headshots/nba/latest/260x190/{player_id}.png'
+    with http_session_lock:
+        if http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
 
-    # Retrieves bytes of data from the URL
-    response = requests.get(url)
-    response.raise_for_status()     # Checks if the website returns an error message
+            http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+            http_session.mount("https://", adapter)
+            http_session.mount("http://", adapter)
 
-    # If the size of the image data is less than 5000, it's likely a blank placeholder image
-    # Hence, we want to select a different player
-    if len(response.content) < 5000:
-        return False
+        return http_session
+
+
+def fetch_headshot(player_id: int) -> Optional[bytes]:
+    """Return the PNG bytes of a player's headshot, or None if the NBA only has a blank placeholder for them."""
+
+    # Checking if a previous session already downloaded the headshot (or found that it was a placeholder)
+    headshot_cache = get_headshot_cache()
+
+    with span("headshot_cache"):
+        headshot = headshot_cache.get(player_id)
+
+    if headshot is not None and not headshot_cache.needs_revalidation(player_id):
+        return headshot
+
+    if headshot is None and headshot_cache.is_invalid(player_id):
+        return None
+
+    import requests
+
+    url = HEADSHOT_URL.format(player_id=player_id)
+
+    # A cached headshot that's getting old is only downloaded again if the NBA's site says it changed
+    headers = headshot_cache.conditional_headers(player_id) if headshot is not None else {}
+
+    try:
+        with span("headshot_request", player_id=player_id):
+            # stream=True only downloads the headers at first, so a placeholder can be spotted before its body
+            with get_http_session().get(url, headers=headers, timeout=HEADSHOT_TIMEOUT, stream=True) as response:
+                if response.status_code == 304 and headshot is not None:
+                    # Reading the (empty) body hands the connection back to the pool, instead of closing it
+                    response.content
+                    headshot_cache.mark_revalidated(player_id)
+                    return headshot
+
+                response.raise_for_status()     # Checks if the website returns an error message
+
+                # If the size of the image data is less than 5000, it's likely a blank placeholder image
+                # Hence, we want to select a different player
+                # (Content-Length is only the image's size if the response isn't compressed)
+                content_length = response.headers.get('Content-Length')
+                if content_length is not None and 'Content-Encoding' not in response.headers:
+                    if int(content_length) < PLACEHOLDER_BYTES:
+                        # The rest of the (tiny) response is read & thrown away, so the connection can be used again
+                        response.content
+                        headshot_cache.mark_invalid(player_id)
+                        return None
+
+                content = response.content
+
+    except requests.exceptions.RequestException:
+        # The NBA's site couldn't be reached, but the cached headshot is still fine to use
+        if headshot is not None:
+            return headshot
+        raise
+
+    # Servers that don't send Content-Length are checked after the download instead
+    if len(content) < PLACEHOLDER_BYTES:
+        headshot_cache.mark_invalid(player_id)
+        return None
+
+    headshot_cache.put(player_id, content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return content
+
+
+def save_headshot(headshot: bytes) -> None:
+    """Write the bytes of a headshot to 'Images/curr_player.jpg'."""
 
     # If there is an image already named 'curr_player' in the file, delete it
     if os.path.exists(get_file_path(os.path.join("Images", "curr_player.jpg"))):
@@ -162,74 +745,130 @@ def download_headshot(player_id: int) -> bool:
 
     # Converts the data into an image named "curr_player.jpg"
     with open(get_file_path(os.path.join("Images", "curr_player.jpg")), 'wb') as image:
-        image.write(response.content)
+        image.write(headshot)
+
+
+def download_headshot(player_id: int) -> bool:
+    """Downloading an image of a player's headshot, based on their ID."""
+
+    with span("fetch_headshot", player_id=player_id):
+        headshot = fetch_headshot(player_id)
+
+    if headshot is None:
+        return False
+
+    with span("save_headshot"):
+        save_headshot(headshot)
 
     return True
 
 
-def update_casual_players() -> None:
-    """Store players that are categorized as CASUAL into a permanent JSON file."""
+def prepare_question(mode: str) -> tuple[NBAPlayer, list[str]]:
+    """Return a ready-to-display question: the player (with their headshot) & their list of options."""
 
-    casual_player_pool = []
+    # The time spent on each stage is kept with the question, for the overlay & the trace (see Tracing.py)
+    begin_question()
 
-    for year in range(1990, 2025):
+    with span("get_player", mode=mode):
+        player_obj = get_player(mode)
 
-        # Getting the current season (e.g. 1995-1996)
-        curr_season = f"{year}-{str(year + 1)[-2:]}"
+    with span("get_options"):
+        choices_list = get_options(player_obj.full_name, player_obj.id)
 
-        stat_leaders = leagueleaders.LeagueLeaders(season=curr_season)
-        table = stat_leaders.get_data_frames()[0]
+    end_question(player_obj.id)
+    return player_obj, choices_list
 
-        # Takes the top 10 leaders in TOTAL POINTS & turns their player IDs into a set
-        # (e.g. [1628983, 1630162, 203999, 203507, 1628369])
-        top_scorers_ids = table.iloc[:10]["PLAYER_ID"].tolist()
 
-        # Turns a list of IDs into a list of player dictionaries
-        # (e.g. [955, ...] -> [{'id': 955, 'full_name': 'Samaki Walker', ...}, ...]
-        top_scorers_by_dict = [create_player_with_id(id_num) for id_num in top_scorers_ids]
+def prefetch_worker(mode: str) -> None:
+    """Keep the given mode's prefetch queue topped up with prepared questions (runs in a background thread)."""
 
-        casual_player_pool.extend(top_scorers_by_dict)
+    import requests
 
-    with open(get_file_path(os.path.join('Datasets', 'casual_players.json')), "w") as file:
-        json.dump(casual_player_pool, file)
+    failures = 0
 
+    while True:
+        try:
+            question = prepare_question(mode)
+
+        except requests.exceptions.RequestException as error:
+            # The NBA's servers didn't respond properly, so wait a moment before trying again, unless it keeps happening
+            # (e.g. there's no network), in which case the game is told
+            failures += 1
+            if failures >= PREFETCH_MAX_FAILURES:
+                prefetch_queues[mode].put(error)
+                failures = 0
+
+            time.sleep(1)
+            continue
 
-def update_diehard_players() -> None:
-    """Store players that are categorized as DIEHARD into a permanent JSON file."""
+        # Anything else (e.g. a pool without any valid players left) is passed on to the game, which would otherwise
+        # wait forever for a question from a thread that died
+        except Exception as error:
+            prefetch_queues[mode].put(error)
+            time.sleep(1)
+            continue
 
-    diehard_player_pool = []
-    seasons_done = 0    # Testing purposes
+        failures = 0
 
-    for year in range(1990, 2025):
+        # Blocks until the game has popped a question off a full queue
+        prefetch_queues[mode].put(question)
 
-        curr_season = f"{year}-{str(year + 1)[-2:]}"
 
-        stat_leaders = leagueleaders.LeagueLeaders(season=curr_season)
-        table = stat_leaders.get_data_frames()[0]
+def start_prefetching() -> None:
+    """Start the background threads that prepare the upcoming questions for BOTH modes."""
 
-        # Fetching players that are ranked in the MIDDLE tier on the total scoring list
-        # (e.g. If 500 players played in a particular season, we'd get the players ranking from 245 to 255)
-        mid_index = len(table) // 2
-        mid_scorers_ids = table.iloc[mid_index - 5: mid_index + 5]['PLAYER_ID'].tolist()
+    # Only start the threads once
+    if prefetch_threads:
+        return
 
-        mid_scorers_by_dict = [create_player_with_id(id_num) for id_num in mid_scorers_ids]
+    for mode in prefetch_queues:
+        # Daemon threads don't stop the game from closing
+        thread = threading.Thread(target=prefetch_worker, args=(mode,), daemon=True)
+        thread.start()
+        prefetch_threads.append(thread)
 
-        diehard_player_pool.extend(mid_scorers_by_dict)
 
-        seasons_done += 1
-        print(seasons_done)
+def get_question(mode: str, timeout: Optional[float] = None) -> tuple[NBAPlayer, list[str]]:
+    """Return the next question for the given mode, taking it from the prefetch queue when it's running.
 
-    with open(get_file_path(os.path.join('Datasets', 'diehard_players.json')), "w") as file:
-        json.dump(diehard_player_pool, file)
+    Raises queue.Empty if no question was ready within 'timeout' seconds, and re-raises a prefetch thread's error.
+    """
 
+    # Without the prefetch threads, the question has to be prepared on the spot
+    if not prefetch_threads:
+        return prepare_question(mode)
 
-def create_player_with_id(player_id: int) -> Optional[NBAPlayer]:
-    """Return the dict of the player with the matching ID."""
+    question = prefetch_queues[mode].get(timeout=timeout)
 
-    for player in all_players:
+    if isinstance(question, Exception):
+        raise question
+
+    return question
+
+
+def update_casual_players() -> None:
+    """Store players that are categorized as CASUAL into a permanent JSON file."""
+
+    # The seasons are fetched concurrently & saved as they arrive, so a failed run picks up where it stopped
+    from Rebuild import rebuild_pools
+    rebuild_pools(('casual',))
+
+
+def update_diehard_players() -> None:
+    """Store players that are categorized as DIEHARD into a permanent JSON file."""
+
+    # Shares its saved season tables with update_casual_players(), so running both only fetches each season once
+    from Rebuild import rebuild_pools
+    rebuild_pools(('diehard',))
+
+
+def create_player_with_id(player_id: int) -> Optional[dict]:
+    """Return the dict of the player with the matching ID."""
 
-        if player['id'] == player_id:
-            return player
+    load_player_data()
+    position = player_registry.position(player_id)
 
-    return None
+    if position is None:
+        return None
 
+    return player_registry.player_dict(position)
@@ -0,0 +1,328 @@
+"""This file will contain the benchmarks for the question pipeline (Backend.py) & the screens (Frontend.py).
+
+Every benchmark runs against Replay.py's stand-in, filled with made-up (but realistically sized) fixtures, and the
+screens are drawn with SDL's "dummy" video & audio drivers, so no network or window is needed.
+
+Usage:  python Benchmark.py --output results.json
+        python Benchmark.py --compare baseline.json      (exits with 1 if anything got slower than the threshold)
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+
+
+# How much slower (as a fraction of the baseline's median) a benchmark can get before it's flagged
+REGRESSION_THRESHOLD = 0.2
+
+
+def setup_environment() -> str:
+    """Point the game's cache & SDL at places that don't need a real home folder or screen. Return the cache folder."""
+
+    cache_folder = tempfile.mkdtemp(prefix="hoopster-bench-")
+
+    # Has to happen before Backend & pygame are imported, since they read these when they're loaded
+    os.environ["HOOPSTER_CACHE_DIR"] = cache_folder
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    return cache_folder
+
+
+def time_function(function: Callable, runs: int, setup: Callable = None) -> dict:
+    """Run 'function' several times and return its timings in milliseconds."""
+
+    timings = []
+
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+
+    return {'runs': runs,
+            'median_ms': statistics.median(timings),
+            'mean_ms': statistics.fmean(timings),
+            'min_ms': timings[0],
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))]}
+
+
+def make_headshot(player_id: int) -> bytes:
+    """Return a made-up 260x190 PNG headshot (noisy enough to be bigger than the 5000-byte placeholder limit)."""
+
+    import pygame
+    import random
+
+    rng = random.Random(player_id)
+    surface = pygame.Surface((260, 190))
+
+    for x in range(0, 260, 5):
+        for y in range(0, 190, 5):
+            surface.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (x, y, 5, 5))
+
+    image = io.BytesIO()
+    pygame.image.save(surface, image, "headshot.png")
+    return image.getvalue()
+
+
+def stats_path(endpoint) -> str:
+    """Return the path on the stand-in that nba_api requests for the given endpoint."""
+
+    import requests
+
+    # nba_api sends its parameters in sorted order (see NBAHTTP.send_api_request)
+    request = requests.Request('GET', f"http://stand-in/stats/{endpoint.endpoint}",
+                               params=sorted(endpoint.parameters.items()))
+    return request.prepare().path_url
+
+
+def stats_body(endpoint, rows: dict) -> bytes:
+    """Return a stats.nba.com-style response for the endpoint, with the given rows in the named data sets."""
+
+    result_sets = []
+
+    # The data sets with rows come first, since the game reads get_data_frames()[0]
+    for name in sorted(endpoint.expected_data, key=lambda data_set_name: data_set_name not in rows):
+        headers = endpoint.expected_data[name]
+        rows_by_header = [[row.get(header, 0) for header in headers] for row in rows.get(name, [])]
+        result_sets.append({'name': name, 'headers': headers, 'rowSet': rows_by_header})
+
+    return json.dumps({'resultSets': result_sets}).encode()
+
+
+def make_fixtures(store, player_ids: list[int], seasons: list[str]) -> None:
+    """Fill the fixture store with headshots & career stats for every player, plus each season's scoring leaders."""
+
+    import random
+    from nba_api.stats.endpoints import playercareerstats, leagueleaders
+
+    rng = random.Random(0)
+
+    for player_id in player_ids:
+        store.save(f"/headshots/nba/latest/260x190/{player_id}.png", 200, {'Content-Type': 'image/png'},
+                   make_headshot(player_id))
+
+        endpoint = playercareerstats.PlayerCareerStats(player_id=player_id, get_request=False)
+        career = [{'PLAYER_ID': player_id, 'SEASON_ID': f"{2000 + season}-{str(2001 + season)[-2:]}",
+                   'GP': rng.randint(20, 82), 'PTS': rng.randint(100, 2500)} for season in range(rng.randint(1, 15))]
+        store.save(stats_path(endpoint), 200, {'Content-Type': 'application/json'},
+                   stats_body(endpoint, {'SeasonTotalsRegularSeason': career}))
+
+    for season in seasons:
+        endpoint = leagueleaders.LeagueLeaders(season=season, get_request=False)
+
+        # ~500 players per season, sorted by total points like the real table
+        leaders = sorted(({'PLAYER_ID': rng.choice(player_ids), 'GP': rng.randint(1, 82), 'PTS': rng.randint(0, 2500)}
+                          for _ in range(500)), key=lambda row: -row['PTS'])
+        store.save(stats_path(endpoint), 200, {'Content-Type': 'application/json'},
+                   stats_body(endpoint, {'LeagueLeaders': leaders}))
+
+
+def run_backend_benchmarks(results: dict, stand_in_url: str, seasons: list[str], runs: int) -> None:
+    """Time the question pipeline against the stand-in."""
+
+    import Backend
+    import Rebuild
+    from Installer import get_file_path
+    from Replay import use_stand_in
+    from Cache import HEADSHOT_REVALIDATE_AFTER
+
+    Backend.HEADSHOT_URL = use_stand_in(stand_in_url)
+
+    pool_ids = [player_dict['id'] for player_dict in [*Backend.casual_data, *Backend.diehard_data]]
+    ids_iter = iter(pool_ids * (runs // len(pool_ids) + 2))
+
+    results['NBAPlayer()'] = time_function(lambda: Backend.NBAPlayer(Backend.casual_data[0]), runs * 10)
+    results['create_player_with_id'] = time_function(lambda: Backend.create_player_with_id(893), runs * 10)
+    results['get_options'] = time_function(lambda: Backend.get_options("Michael Jordan", 893), runs * 10)
+    results['get_options_batch (100 questions)'] = time_function(
+        lambda: Backend.get_options_batch(["Michael Jordan"] * 100, [893] * 100), runs)
+
+    # Each call downloads a different player's headshot, so none of them are served by the headshot cache
+    # download_headshot() overwrites 'Images/curr_player.jpg', so the original is put back afterwards (even if a
+    # download fails)
+    cold_runs = min(runs, len(set(pool_ids)))
+    with open(get_file_path(os.path.join("Images", "curr_player.jpg")), 'rb') as image:
+        original_image = image.read()
+
+    try:
+        results['download_headshot (cold)'] = time_function(lambda: Backend.download_headshot(next(ids_iter)),
+                                                            cold_runs)
+    finally:
+        with open(get_file_path(os.path.join("Images", "curr_player.jpg")), 'wb') as image:
+            image.write(original_image)
+
+    results['fetch_headshot (cached)'] = time_function(lambda: Backend.fetch_headshot(pool_ids[0]), runs)
+
+    # Treating every cached headshot as old, so each call asks the stand-in whether it changed (and gets a 304 back)
+    Backend.headshot_cache.revalidate_after = 0
+    results['fetch_headshot (revalidated)'] = time_function(lambda: Backend.fetch_headshot(pool_ids[0]), runs)
+    Backend.headshot_cache.revalidate_after = HEADSHOT_REVALIDATE_AFTER
+
+    results['categorize_player (cold)'] = time_function(
+        lambda: Backend.NBAPlayer(Backend.create_player_with_id(next(ids_iter))).category, cold_runs)
+
+    results['get_player (casual)'] = time_function(lambda: Backend.get_player('casual'), runs)
+    results['get_player (diehard)'] = time_function(lambda: Backend.get_player('diehard'), runs)
+
+    # The dataset builders fetch every season from the stand-in (the checkpoints are deleted before each run)
+    def clear_checkpoints() -> None:
+        for season in seasons:
+            if os.path.exists(Rebuild.checkpoint_path(season)):
+                os.remove(Rebuild.checkpoint_path(season))
+
+    years = [int(season[:4]) for season in seasons]
+    results['fetch_seasons'] = time_function(lambda: Rebuild.fetch_seasons(years, rate=1000.0), max(1, runs // 10),
+                                             setup=clear_checkpoints)
+
+    tables = Rebuild.fetch_seasons(years)
+    results['build_pool (casual)'] = time_function(lambda: Rebuild.build_pool('casual', tables), runs)
+    results['build_pool (diehard)'] = time_function(lambda: Rebuild.build_pool('diehard', tables), runs)
+
+    # Career totals & categories of every player in the season tables, at once
+    results['categorize_players (bulk)'] = time_function(
+        lambda: Rebuild.categorize_players(Rebuild.career_totals(tables)), runs)
+
+
+def run_frontend_benchmarks(results: dict, runs: int) -> None:
+    """Time the screens' draw functions on SDL's dummy display."""
+
+    import pygame
+    import Backend
+    import Frontend
+    from Engine import GameEngine
+
+    images = Frontend.load_clutch_images(), Frontend.load_choke_images()
+    announcer_calls = Frontend.load_announcer_calls()
+    background = "Images/Backgrounds/dark_background.jpg"
+
+    player_obj = Backend.get_player('casual')
+    choices = Backend.get_options(player_obj.full_name, player_obj.id)
+
+    results['display_scaled_image (first load)'] = time_function(
+        lambda: Frontend.display_scaled_image(background, (900, 500), (0, 0)), 1, setup=Frontend.asset_cache.clear)
+    results['display_scaled_image'] = time_function(
+        lambda: Frontend.display_scaled_image(background, (900, 500), (0, 0)), runs)
+    results['load_headshot'] = time_function(lambda: Frontend.load_headshot(player_obj.headshot), runs)
+    results['display_options'] = time_function(lambda: Frontend.display_options(choices), runs)
+
+    # check_correct_ans() waits for ENTER, so one is queued up before each run
+    def queue_enter() -> None:
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN))
+
+    results['check_correct_ans'] = time_function(
+        lambda: Frontend.check_correct_ans(player_obj.full_name, choices[0], images, announcer_calls), runs,
+        setup=queue_enter)
+
+    results['flip_display'] = time_function(
+        lambda: (Frontend.mark_dirty(Frontend.screen.get_rect()), Frontend.flip_display()), runs)
+
+    # The switch to the next question after ENTER: drawn from scratch, or swapped in after being drawn off-screen
+    # while the result screen was up (the question itself is ready in both cases)
+    def redraw_question() -> None:
+        Frontend.fetch_next_player(player_obj, choices, True)
+        Frontend.display_points_change(100, 100)
+        Frontend.flip_display()
+
+    results['next question (redrawn)'] = time_function(redraw_question, runs)
+
+    engine = GameEngine(Backend.get_question)
+    engine.mode, engine.points, engine.last_points_change = 'casual', 100, 100
+
+    results['next question (pre-composed)'] = time_function(
+        lambda: (Frontend.show_next_frame(), Frontend.flip_display()), runs,
+        setup=lambda: Frontend.compose_next_question(engine, True))
+
+    Frontend.ready_question = None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return a message for every benchmark whose median got slower than the baseline's by more than 'threshold'."""
+
+    regressions = []
+
+    for name, timing in results.items():
+        if name not in baseline:
+            continue
+
+        old_median = baseline[name]['median_ms']
+        new_median = timing['median_ms']
+
+        if new_median > old_median * (1 + threshold):
+            regressions.append(f"{name}: {old_median:.3f} ms -> {new_median:.3f} ms "
+                               f"(+{(new_median / old_median - 1) * 100:.0f}%)")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks for the question pipeline & the screens")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in adds to every response")
+    parser.add_argument("--skip-frontend", action="store_true")
+    args = parser.parse_args()
+
+    cache_folder = setup_environment()
+
+    import Backend
+    import Rebuild
+    from Replay import FixtureStore, StandInServer
+
+    print("Making fixtures...")
+    seasons = [Rebuild.season_name(year) for year in range(Rebuild.FIRST_YEAR, Rebuild.LAST_YEAR + 1)]
+    pool_ids = sorted({player_dict['id'] for player_dict in [*Backend.casual_data, *Backend.diehard_data]})
+
+    store = FixtureStore(os.path.join(cache_folder, "fixtures"))
+    make_fixtures(store, pool_ids, seasons)
+    server = StandInServer(0, "replay", store, latency=args.latency).start()
+
+    results = {}
+    run_backend_benchmarks(results, server.url, seasons, args.runs)
+
+    if not args.skip_frontend:
+        run_frontend_benchmarks(results, args.runs)
+
+    server.shutdown()
+    shutil.rmtree(cache_folder, ignore_errors=True)
+
+    for name, timing in results.items():
+        print(f"{name:<40} median {timing['median_ms']:9.3f} ms   p95 {timing['p95_ms']:9.3f} ms")
+
+    with open(args.output, "w") as file:
+        json.dump({'python': sys.version.split()[0], 'platform': platform.platform(), 'results': results}, file,
+                  indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)['results']
+
+        regressions = compare(results, baseline, args.threshold)
+
+        for message in regressions:
+            print(f"REGRESSION  {message}")
+
+        if regressions:
+            return 1
+
+        print("No regressions.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
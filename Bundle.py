@@ -0,0 +1,210 @@
+"""This file will contain the asset bundle: every image (pre-scaled to its on-screen size) & sound packed into ONE file.
+
+The bundle is built before the game is packaged (the PyInstaller spec builds it), and is memory-mapped when the game
+starts, so assets are read by key (e.g. "Images/simpson_vibing.png") instead of walking the 'Images' & 'Audio' folders.
+When there's no bundle (e.g. while developing), or it's older than the files it was built from (when running from the
+source, rather than the packaged game), the same keys are read from the folders instead.
+
+Layout:     header      b"HOOPPACK", version (uint16), reserved (uint16), size of the index (uint32)
+            index       JSON: key -> [offset, size, width, height] (width & height are 0 for sounds)
+            data        every asset's bytes, each starting on a 16-byte boundary
+
+Usage:  python Bundle.py      (writes 'assets.bundle')
+"""
+
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Optional
+from Installer import get_file_path
+
+
+BUNDLE_NAME = "assets.bundle"
+
+MAGIC = b"HOOPPACK"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI")
+ALIGNMENT = 16
+
+# Every image's on-screen size (None = drawn at its own size)
+IMAGE_SIZES = {"Images/Backgrounds/basketballs.jpg": (900, 500),
+               "Images/Backgrounds/basketball_net.jpg": (900, 500),
+               "Images/Backgrounds/man_disappointed.jpg": (900, 500),
+               "Images/Backgrounds/dark_background.jpg": (900, 500),
+               "Images/simpson_vibing.png": (60, 60),
+               "Images/simpson_bored.png": (60, 60),
+               "Images/green_arrow.png": (15, 15),
+               "Images/red_arrow.png": (15, 15),
+               "Images/mamba_out.jpg": (480, 334),
+               "Images/casual_player_img.png": None,
+               "Images/diehard_player_img.jpg": None}
+
+# Folders whose images are all drawn at the same size (e.g. the 'Clutch Moments' shown next to the result)
+FOLDER_SIZES = {"Images/Clutch Moments": (271, 153),
+                "Images/Choke Moments": (271, 153)}
+
+# Folders of sounds (every file in them is packed as-is)
+SOUND_FOLDERS = ["Audio", "Audio/Good", "Audio/Bad"]
+
+
+def folder_keys(folder: str) -> list[str]:
+    """Return the keys of the files directly inside one of the game's folders (e.g. "Audio/Good" -> ["Audio/Good/Bang.mp3", ...])."""
+
+    folder_path = get_file_path(os.path.join(*folder.split("/")))
+
+    return sorted(f"{folder}/{filename}" for filename in os.listdir(folder_path)
+                  if os.path.isfile(os.path.join(folder_path, filename)))
+
+
+def image_sizes() -> dict[str, Optional[tuple[int, int]]]:
+    """Return the on-screen size of every image that goes in the bundle."""
+
+    sizes = dict(IMAGE_SIZES)
+
+    for folder, size in FOLDER_SIZES.items():
+        for key in folder_keys(folder):
+            sizes[key] = size
+
+    return sizes
+
+
+class AssetBundle:
+    """A memory-mapped asset bundle. Reading an asset returns a view of the file, so nothing is copied."""
+
+    index: dict             # Key -> [offset, size, width, height]
+    buffer: mmap.mmap
+
+    def __init__(self, file_path: str):
+        with open(file_path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, index_size = HEADER.unpack_from(self.buffer)
+
+        if magic != MAGIC:
+            raise ValueError(f"{file_path} isn't an asset bundle")
+        if version != VERSION:
+            raise ValueError(f"{file_path} is version {version}, but only version {VERSION} can be read")
+
+        self.index = json.loads(self.buffer[HEADER.size:HEADER.size + index_size])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def read(self, key: str) -> memoryview:
+        """Return the bytes of the asset with the given key."""
+
+        offset, size, _, _ = self.index[key]
+        return memoryview(self.buffer)[offset:offset + size]
+
+    def size(self, key: str) -> tuple[int, int]:
+        """Return the (width, height) that an image was packed at."""
+
+        return tuple(self.index[key][2:])
+
+    def keys(self, folder: str) -> list[str]:
+        """Return the keys of the assets directly inside the given folder (e.g. "Images/Clutch Moments")."""
+
+        return sorted(key for key in self.index if key.rpartition("/")[0] == folder)
+
+
+def is_stale(file_path: str) -> bool:
+    """Return whether any of the bundle's images or sounds (or their folders) changed after the bundle was built."""
+
+    bundle_time = os.path.getmtime(file_path)
+
+    # A folder's time changes when a file is added to or removed from it
+    keys = list(image_sizes()) + [key for folder in SOUND_FOLDERS for key in folder_keys(folder)]
+    keys += list(FOLDER_SIZES) + SOUND_FOLDERS
+
+    try:
+        return any(os.path.getmtime(get_file_path(os.path.join(*key.split("/")))) > bundle_time for key in keys)
+
+    # An image that the bundle expects has been deleted
+    except OSError:
+        return True
+
+
+def load_bundle() -> Optional[AssetBundle]:
+    """Return the game's asset bundle, or None if it hasn't been built, is out of date, or can't be read."""
+
+    try:
+        # The packaged game's bundle was built from its own files, so it's only checked when running from the source
+        # (where an image may have been edited since 'python Bundle.py' was last run)
+        if not hasattr(sys, '_MEIPASS') and is_stale(get_file_path(BUNDLE_NAME)):
+            return None
+
+        return AssetBundle(get_file_path(BUNDLE_NAME))
+    except (OSError, ValueError):
+        return None
+
+
+def encode_image(key: str, size: Optional[tuple[int, int]]) -> tuple[bytes, int, int]:
+    """Return the image scaled to its on-screen size & re-encoded, plus its width & height."""
+
+    import pygame
+
+    image = pygame.image.load(get_file_path(os.path.join(*key.split("/"))))
+
+    if size is not None and image.get_size() != size:
+        # smoothscale() needs a 24 or 32-bit image (e.g. some PNGs are stored with a palette)
+        if image.get_bitsize() < 24:
+            converted = pygame.Surface(image.get_size(), pygame.SRCALPHA, 32)
+            converted.blit(image, (0, 0))
+            image = converted
+
+        image = pygame.transform.smoothscale(image, size)
+
+    # PNGs are kept as PNGs (so they keep their transparency), and everything else becomes a JPEG
+    extension = ".png" if key.lower().endswith(".png") else ".jpg"
+
+    encoded = io.BytesIO()
+    pygame.image.save(image, encoded, "image" + extension)
+
+    return encoded.getvalue(), image.get_width(), image.get_height()
+
+
+def build_bundle(file_path: Optional[str] = None) -> str:
+    """Pack every image (scaled to its on-screen size) & sound into the bundle. Return the bundle's file path."""
+
+    file_path = file_path or get_file_path(BUNDLE_NAME)
+
+    assets = {}     # Key -> (bytes, width, height)
+
+    for key, size in image_sizes().items():
+        assets[key] = encode_image(key, size)
+
+    for folder in SOUND_FOLDERS:
+        for key in folder_keys(folder):
+            with open(get_file_path(os.path.join(*key.split("/"))), 'rb') as file:
+                assets[key] = file.read(), 0, 0
+
+    # The index holds the assets' offsets, which depend on the size of the index itself, so the index is padded to
+    # a size that its offsets can't outgrow
+    index_size = len(json.dumps({key: [2 ** 32, 2 ** 32, 9999, 9999] for key in assets}).encode())
+    offset = HEADER.size + index_size
+    index = {}
+
+    for key, (data, width, height) in assets.items():
+        offset += -offset % ALIGNMENT
+        index[key] = [offset, len(data), width, height]
+        offset += len(data)
+
+    index_bytes = json.dumps(index).encode().ljust(index_size)
+
+    with open(file_path + ".tmp", 'wb') as bundle:
+        bundle.write(HEADER.pack(MAGIC, VERSION, 0, index_size) + index_bytes)
+
+        for key, (data, _, _) in assets.items():
+            bundle.write(b"\0" * (index[key][0] - bundle.tell()))
+            bundle.write(data)
+
+    os.replace(file_path + ".tmp", file_path)
+    return file_path
+
+
+if __name__ == "__main__":
+    path = build_bundle()
+    print(f"{path}: {len(AssetBundle(path).index)} assets, {os.path.getsize(path)} bytes")
@@ -0,0 +1,269 @@
+"""This file will contain the on-disk caches that let the game skip network requests it already made in a past session."""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from Installer import get_cache_path
+
+
+# Default number of bytes the headshot cache may use on disk (the pools' ~400 headshots take roughly 25 MB)
+HEADSHOT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Number of seconds a player stays marked as having a placeholder headshot, before we check the NBA's site again
+INVALID_HEADSHOT_TTL = 7 * 24 * 60 * 60
+
+# Number of seconds a cached headshot is used as-is, before we ask the NBA's site whether it has changed
+# (that request only downloads the headshot again if it HAS changed)
+HEADSHOT_REVALIDATE_AFTER = 24 * 60 * 60
+
+
+class HeadshotCache:
+    """An on-disk, size-limited cache of players' headshots, which also remembers IDs with placeholder headshots."""
+
+    folder: str
+    max_bytes: int
+    invalid_ttl: float
+    revalidate_after: float
+    entries: OrderedDict    # Player ID -> size of their headshot in bytes (least recently used first)
+    validators: dict        # Player ID -> [ETag, Last-Modified, time the headshot was last checked with the NBA's site]
+    invalid: dict           # Player ID -> time at which their headshot was found to be a placeholder
+    total_bytes: int
+    lock: threading.Lock
+
+    def __init__(self, folder: Optional[str] = None, max_bytes: int = HEADSHOT_CACHE_BYTES,
+                 invalid_ttl: float = INVALID_HEADSHOT_TTL, revalidate_after: float = HEADSHOT_REVALIDATE_AFTER):
+        self.folder = folder or get_cache_path("headshots")
+        self.max_bytes = max_bytes
+        self.invalid_ttl = invalid_ttl
+        self.revalidate_after = revalidate_after
+        self.entries = OrderedDict()
+        self.validators = {}
+        self.invalid = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()    # The prefetch threads use the cache at the same time
+
+        # The cache only saves time, so a folder that can't be created (e.g. a read-only home folder) just means every
+        # headshot is downloaded, instead of the game crashing
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+        except OSError:
+            pass
+
+        self.load_index()
+
+    def headshot_path(self, player_id: int) -> str:
+        """Return the file path of a player's cached headshot."""
+
+        return os.path.join(self.folder, f"{player_id}.png")
+
+    def load_index(self) -> None:
+        """Load the cache's index from the previous session, ignoring entries whose file has gone missing."""
+
+        index_path = os.path.join(self.folder, "index.json")
+
+        try:
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+
+        # The index stores the entries in LRU order (e.g. [[893, 28211, '"5f1e..."', 'Tue, 01 Oct ...', 1727740800], ...])
+        # Indexes from before the validators were added only have [ID, size], so those are checked again a day later
+        for player_id, size, *validators in index.get('entries', []):
+            if os.path.exists(self.headshot_path(player_id)):
+                self.entries[player_id] = size
+                self.validators[player_id] = validators or [None, None, now]
+                self.total_bytes += size
+
+        # JSON turns the dict's keys into strings, so they're turned back into IDs
+        for player_id, marked_at in index.get('invalid', {}).items():
+            if now - marked_at < self.invalid_ttl:
+                self.invalid[int(player_id)] = marked_at
+
+    def save_index(self) -> None:
+        """Write the cache's index to disk (the caller must hold the lock)."""
+
+        index = {'entries': [[player_id, size, *self.validators[player_id]] for player_id, size in self.entries.items()],
+                 'invalid': self.invalid}
+
+        # Writing to a temporary file first means a crash can never leave a half-written index behind
+        # (if the disk is full or read-only, the index is still kept in memory for this session)
+        index_path = os.path.join(self.folder, "index.json")
+        try:
+            with open(index_path + ".tmp", 'w') as file:
+                json.dump(index, file)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError:
+            pass
+
+    def get(self, player_id: int) -> Optional[bytes]:
+        """Return the cached headshot of a player, or None if it isn't cached."""
+
+        with self.lock:
+            if player_id not in self.entries:
+                return None
+
+            try:
+                with open(self.headshot_path(player_id), 'rb') as image:
+                    headshot = image.read()
+            except OSError:
+                # The file was deleted behind our back
+                self.total_bytes -= self.entries.pop(player_id)
+                self.validators.pop(player_id, None)
+                return None
+
+            self.entries.move_to_end(player_id)     # Marks the headshot as the most recently used
+            return headshot
+
+    def put(self, player_id: int, headshot: bytes, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> None:
+        """Store a player's headshot (and the headers used to check whether it changed), evicting the least recently
+        used headshots if the cache is over budget."""
+
+        with self.lock:
+            # A headshot that can't be written (e.g. the disk is full) just isn't cached, so it's downloaded next time
+            try:
+                with open(self.headshot_path(player_id), 'wb') as image:
+                    image.write(headshot)
+            except OSError:
+                return
+
+            self.total_bytes -= self.entries.pop(player_id, 0)
+            self.entries[player_id] = len(headshot)
+            self.validators[player_id] = [etag, last_modified, time.time()]
+            self.total_bytes += len(headshot)
+
+            # Evicting the oldest headshots (but never the one that was just added)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_id, old_size = self.entries.popitem(last=False)
+                self.validators.pop(old_id, None)
+                self.total_bytes -= old_size
+
+                try:
+                    os.remove(self.headshot_path(old_id))
+                except OSError:
+                    pass
+
+            self.save_index()
+
+    def needs_revalidation(self, player_id: int) -> bool:
+        """Return whether a cached headshot is old enough that the NBA's site should be asked if it changed."""
+
+        with self.lock:
+            validators = self.validators.get(player_id)
+            return validators is not None and time.time() - validators[2] >= self.revalidate_after
+
+    def conditional_headers(self, player_id: int) -> dict:
+        """Return the headers that make the NBA's site answer '304 Not Modified' if a cached headshot hasn't changed."""
+
+        with self.lock:
+            etag, last_modified, _ = self.validators.get(player_id, [None, None, 0])
+
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        return headers
+
+    def mark_revalidated(self, player_id: int) -> None:
+        """Remember that the NBA's site confirmed a cached headshot is still up to date."""
+
+        with self.lock:
+            if player_id in self.validators:
+                self.validators[player_id][2] = time.time()
+                self.save_index()
+
+    def is_invalid(self, player_id: int) -> bool:
+        """Return whether the player was recently found to have a placeholder headshot."""
+
+        with self.lock:
+            marked_at = self.invalid.get(player_id)
+
+            if marked_at is None:
+                return False
+
+            # The mark has expired, so the player's headshot is worth checking again
+            if time.time() - marked_at >= self.invalid_ttl:
+                del self.invalid[player_id]
+                return False
+
+            return True
+
+    def mark_invalid(self, player_id: int) -> None:
+        """Remember that the player has a placeholder headshot (dropping the headshot cached before it was replaced)."""
+
+        with self.lock:
+            self.invalid[player_id] = time.time()
+
+            if player_id in self.entries:
+                self.total_bytes -= self.entries.pop(player_id)
+                self.validators.pop(player_id, None)
+
+                try:
+                    os.remove(self.headshot_path(player_id))
+                except OSError:
+                    pass
+
+            self.save_index()
+
+    def invalid_ids(self) -> set[int]:
+        """Return the IDs of all players that are currently marked as having a placeholder headshot."""
+
+        with self.lock:
+            now = time.time()
+            return {player_id for player_id, marked_at in self.invalid.items() if now - marked_at < self.invalid_ttl}
+
+
+class CareerStore:
+    """A persistent store of each player's career totals, which are all that categorize_player() needs."""
+
+    file_path: str
+    totals: dict    # Player ID -> [total points, total games, last season], or None if they never played
+    lock: threading.Lock
+
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path = file_path or get_cache_path("career_totals.json")
+        self.totals = {}
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.file_path, 'r') as file:
+                # JSON turns the dict's keys into strings, so they're turned back into IDs
+                self.totals = {int(player_id): totals for player_id, totals in json.load(file).items()}
+        except (OSError, ValueError):
+            pass
+
+    def __contains__(self, player_id: int) -> bool:
+        return player_id in self.totals
+
+    def get(self, player_id: int) -> Optional[list]:
+        """Return the stored career totals of a player (e.g. [32292, 1072, 2002] for Michael Jordan)."""
+
+        return self.totals.get(player_id)
+
+    def put(self, player_id: int, totals: Optional[list]) -> None:
+        """Store the career totals of a player & write the store to disk."""
+
+        self.put_many({player_id: totals})
+
+    def put_many(self, totals: dict) -> None:
+        """Store the career totals of many players (player ID -> totals), writing the store to disk only once."""
+
+        with self.lock:
+            self.totals.update(totals)
+
+            # If the store can't be written, the totals are still kept in memory for this session
+            try:
+                os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+                with open(self.file_path + ".tmp", 'w') as file:
+                    json.dump(self.totals, file)
+                os.replace(self.file_path + ".tmp", self.file_path)
+            except OSError:
+                pass
@@ -0,0 +1,226 @@
+"""This file will contain the game's rules & round flow, without anything to do with drawing or input.
+
+The pygame screens (Frontend.py) are one driver of the GameEngine. The headless driver below plays scripted rounds as
+fast as the backend allows, to load-test the question pipeline & the caches.
+
+Usage:  python Engine.py --rounds 5000
+        python Engine.py --rounds 5000 --stand-in --make-fixtures     (plays against Replay.py's stand-in)
+
+With --make-fixtures, the made-up fixtures & the headshots downloaded from them go in a temporary cache folder (unless
+--fixtures names a folder to fill), so they never end up in the game's real cache.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import time
+from typing import Callable, Optional
+
+
+# The states of a game, in the order they're first reached
+INTRO = "intro"
+PICK_MODE = "pick_mode"
+QUESTION = "question"
+ANSWER = "answer"
+QUIT = "quit"
+
+MODES = ("casual", "diehard")
+
+# Points won for a correct answer in each mode, and lost for a wrong one
+POINTS_FOR_CORRECT = {'casual': 100, 'diehard': 200}
+POINTS_FOR_WRONG = 50
+
+
+def points_change(is_correct: bool, difficulty: str) -> int:
+    """Return how much the point total goes UP/DOWN by after an answer (e.g. +200 for a correct DIEHARD answer)."""
+
+    if is_correct:
+        return POINTS_FOR_CORRECT[difficulty]
+
+    return -POINTS_FOR_WRONG
+
+
+def other_mode(game_mode: str) -> str:
+    """Return 'diehard' for 'casual', and vice versa."""
+
+    return "diehard" if game_mode == "casual" else "casual"
+
+
+class GameEngine:
+    """The state machine of a single game: INTRO -> PICK_MODE -> QUESTION <-> ANSWER, and QUIT from anywhere.
+
+    Each method is one thing the user can do, and raises ValueError if the game isn't in a state where it's allowed.
+    """
+
+    state: str
+    mode: Optional[str]             # "casual" or "diehard" (None until a mode is picked)
+    points: int
+    player: Optional[object]        # The NBAPlayer of the current question
+    choices: list[str]              # The current question's options
+    last_answer_correct: Optional[bool]
+    last_points_change: int         # How much the last answer changed the point total by (e.g. 100, -50)
+    rounds: int                     # Number of questions answered
+    get_question: Callable[[str], tuple]
+
+    def __init__(self, get_question: Optional[Callable[[str], tuple]] = None):
+        if get_question is None:
+            from Backend import get_question
+
+        self.get_question = get_question
+        self.state = INTRO
+        self.mode = None
+        self.points = 0
+        self.player = None
+        self.choices = []
+        self.last_answer_correct = None
+        self.last_points_change = 0
+        self.rounds = 0
+
+    def expect(self, *states: str) -> None:
+        """Raise ValueError unless the game is in one of the given states."""
+
+        if self.state not in states:
+            raise ValueError(f"Can't do that in the '{self.state}' state (expected {' or '.join(states)})")
+
+    def deal(self) -> None:
+        """Take the next question for the current mode."""
+
+        self.player, self.choices = self.get_question(self.mode)
+        self.state = QUESTION
+
+    def continue_intro(self) -> None:
+        """Leave the intro screen (the user pressed ENTER)."""
+
+        self.expect(INTRO)
+        self.state = PICK_MODE
+
+    def pick_mode(self, game_mode: str) -> None:
+        """Start the game in the given mode, with its first question."""
+
+        self.expect(PICK_MODE)
+
+        if game_mode not in MODES:
+            raise ValueError(f"Unknown mode: {game_mode}")
+
+        self.mode = game_mode
+        self.deal()
+
+    def answer(self, choice: int) -> bool:
+        """Answer the current question with the option at index 'choice'. Return whether it was correct."""
+
+        self.expect(QUESTION)
+
+        self.last_answer_correct = self.choices[choice] == self.player.full_name
+        self.last_points_change = points_change(self.last_answer_correct, self.mode)
+        self.points += self.last_points_change
+        self.rounds += 1
+        self.state = ANSWER
+
+        return self.last_answer_correct
+
+    def next_question(self) -> None:
+        """Move on from the answer to the next question (the user pressed ENTER)."""
+
+        self.expect(ANSWER)
+        self.deal()
+
+    def switch_mode(self) -> None:
+        """Change from 'casual' to 'diehard' (or vice versa), skipping to a question in the new mode."""
+
+        self.expect(QUESTION)
+        self.mode = other_mode(self.mode)
+        self.deal()
+
+    def quit(self) -> None:
+        """End the game."""
+
+        self.state = QUIT
+
+
+def correct_choice(engine: GameEngine) -> int:
+    """Return the index of the current question's correct option."""
+
+    return engine.choices.index(engine.player.full_name)
+
+
+def play_headless(rounds: int, accuracy: float = 0.5, switch_every: int = 0, seed: Optional[int] = 0,
+                  get_question: Optional[Callable[[str], tuple]] = None) -> dict:
+    """Play 'rounds' scripted questions without a screen, and return how fast they were played.
+
+    'accuracy' is the chance of each answer being correct, and the mode is switched every 'switch_every' rounds.
+    """
+
+    rng = random.Random(seed)
+    engine = GameEngine(get_question)
+
+    start = time.perf_counter()
+
+    engine.continue_intro()
+    engine.pick_mode(rng.choice(MODES))
+
+    correct = 0
+
+    while engine.rounds < rounds:
+        if switch_every and engine.rounds and engine.rounds % switch_every == 0:
+            engine.switch_mode()
+
+        if rng.random() < accuracy:
+            choice = correct_choice(engine)
+        else:
+            choice = rng.choice([i for i, name in enumerate(engine.choices) if name != engine.player.full_name])
+
+        correct += engine.answer(choice)
+        engine.next_question()
+
+    engine.quit()
+    elapsed = time.perf_counter() - start
+
+    return {'rounds': engine.rounds, 'correct': correct, 'points': engine.points, 'seconds': elapsed,
+            'rounds_per_second': engine.rounds / elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play scripted rounds without a screen")
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--accuracy", type=float, default=0.5, help="chance of each answer being correct")
+    parser.add_argument("--switch-every", type=int, default=0, help="switch modes every this many rounds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stand-in", action="store_true", help="fetch stats & headshots from Replay.py's stand-in")
+    parser.add_argument("--fixtures", default=None, help="folder of recorded responses for the stand-in")
+    parser.add_argument("--make-fixtures", action="store_true", help="fill the fixture folder with made-up responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in adds to every response")
+    args = parser.parse_args()
+
+    cache_folder = None
+
+    if args.stand_in and args.make_fixtures:
+        from Benchmark import setup_environment
+
+        # Has to happen before Backend is imported, so the made-up headshots aren't saved into the real headshot cache
+        cache_folder = setup_environment()
+        args.fixtures = args.fixtures or os.path.join(cache_folder, "fixtures")
+
+    if args.stand_in:
+        import Backend
+        from Replay import FixtureStore, StandInServer, use_stand_in
+
+        store = FixtureStore(args.fixtures)
+
+        if args.make_fixtures:
+            from Benchmark import make_fixtures
+
+            pool_ids = sorted({player_dict['id'] for player_dict in [*Backend.casual_data, *Backend.diehard_data]})
+            make_fixtures(store, pool_ids, [])
+
+        server = StandInServer(0, "replay", store, latency=args.latency).start()
+        Backend.HEADSHOT_URL = use_stand_in(server.url)
+
+    try:
+        results = play_headless(args.rounds, args.accuracy, args.switch_every, args.seed)
+    finally:
+        if cache_folder is not None:
+            shutil.rmtree(cache_folder, ignore_errors=True)
+
+    print(f"Played {results['rounds']} rounds in {results['seconds']:.2f} s "
+          f"({results['rounds_per_second']:.0f} rounds/s), {results['correct']} correct, {results['points']} points")
@@ -1,11 +1,25 @@
 """This file will contain the backend of the 'Guess the Player' game."""
 
+import time
+
+# Taken before anything else is loaded, so the time-to-first-frame covers the whole startup
+STARTUP_TIME = time.perf_counter()
+
 import pygame
 import sys
+import json
+import threading
+import queue
+from contextlib import contextmanager
+from functools import partial
 from typing import Optional
-from Backend import get_player, get_options
-from Installer import get_file_path
+from collections import OrderedDict
+from Installer import get_file_path, get_cache_path
+from Bundle import load_bundle, folder_keys, IMAGE_SIZES
+from Tracing import span, show_question, last_question, start_tracing
+from Engine import GameEngine, QUESTION
 import os
+import io
 import random
 
 # Display setup
@@ -14,26 +28,90 @@ pygame.mixer.init()     # Lets us play music clips
 screen = pygame.display.set_mode((900, 500))
 
 # Fonts & Colours
-fonts = {'small_font': pygame.font.SysFont("comic sans", 24),
-         'big_font': pygame.font.SysFont("comic sans", 32),
-         'bold_font': pygame.font.SysFont("impact", 32),
-         'title_font': pygame.font.SysFont("chelsea market", 64),
-         'points_font': pygame.font.SysFont("impact", 36),
-         'points_font_2': pygame.font.SysFont("impact", 18),
-         'points_font_3': pygame.font.SysFont("impact", 24)}
+FONT_SPECS = {'small_font': ("comic sans", 24),
+              'big_font': ("comic sans", 32),
+              'bold_font': ("impact", 32),
+              'title_font': ("chelsea market", 64),
+              'points_font': ("impact", 36),
+              'points_font_2': ("impact", 18),
+              'points_font_3': ("impact", 24),
+              'overlay_font': ("consolas", 16)}
+
+
+class LazyFonts(dict):
+    """A dict of fonts that only looks each font up the first time it's used (SysFont lookups are slow)."""
+
+    def __missing__(self, font_name: str) -> pygame.font.Font:
+        name, size = FONT_SPECS[font_name]
+        font = pygame.font.SysFont(name, size)
+        self[font_name] = font
+
+        return font
+
+
+fonts = LazyFonts()
 
 colours = {'WHITE': (255, 255, 255), 'GREY': (128, 128, 128), 'GREEN': (34, 139, 34), 'RED': (200, 50, 50),
            'BLUE': (30, 144, 255), 'YELLOW': (255, 215, 0), 'BLACK': (0, 0, 0)}
 
+# Memory that the converted & scaled images may use, before the least recently used ones are dropped
+ASSET_CACHE_BYTES = 48 * 1024 * 1024
+TEXT_CACHE_SIZE = 256     # Number of rendered labels kept (the option buttons' names change every question)
+
+# (file path, size, alpha) -> converted Surface, and (font, text, colour, background) -> rendered label
+# Both are kept in least recently used order
+asset_cache = OrderedDict()
+asset_cache_bytes = 0
+text_cache = OrderedDict()
+
+# The packed (& pre-scaled) images & sounds, or None when the game runs straight from the folders (see Bundle.py)
+asset_bundle = load_bundle()
+
+# Images drawn without transparency (every other image keeps its transparency)
+OPAQUE_IMAGES = {"Images/casual_player_img.png", "Images/diehard_player_img.jpg"}
+
+# Parts of the screen that were drawn on since the last time the display was flipped
+dirty_rects = []
+
+# The clickable parts of the current screen, registered as they're drawn (see add_widget())
+# Each rect's action is at the same index in 'widget_actions' (e.g. ("answer", 2), ("quit",))
+widget_rects = []
+widget_actions = []
+
 # Game variables
-clock = pygame.time.Clock()
-player_points = 0
+last_frame_ms = 0.0     # Time spent handling the user's last action & drawing its frame (shown by the overlay)
 music_on = True
 
-# Load background theme music
-background_music = pygame.mixer.Sound(get_file_path(os.path.join("Audio", "NBA on NBC Theme.mp3")))
+# The theme music & announcer calls are decoded by load_audio() in the background, so the intro doesn't wait for them
+background_music = None
+announcer_calls = None
+audio_thread = None
+
+# Work that's left until the game is idle (e.g. loading after the first frame, or drawing the next question's screen),
+# which runs one task at a time while the game waits for input
+idle_tasks = []
+first_frame_shown = False
+
+# How often (in seconds) the window is kept responsive while waiting for a question that isn't ready yet
+QUESTION_POLL_SECONDS = 0.1
+
+# The next question & its screen, put together off-screen while the user reads the result (see compose_next_question())
+ready_question = None   # Tuple of (mode, (NBAPlayer, options))
+next_frame = None       # The whole screen of the next question (a Surface the size of the window)
+
+# The performance overlay (toggled with F3) shows the last frame's time & how long each stage of the question took
+OVERLAY_KEY = pygame.K_F3
+overlay_on = False
+overlay_rect = None     # Where the overlay was drawn last frame (the screen surface itself is never drawn on)
+
 music_channel = pygame.mixer.Channel(0)     # Creates a channel for the background score to be played (able to pause/lower volume)
 
+# Creating a 2nd channel to control the announcer's audio
+# When a call finishes, the channel posts ANNOUNCER_END_EVENT so the music's volume can be restored
+ANNOUNCER_END_EVENT = pygame.USEREVENT + 1
+announcer_channel = pygame.mixer.Channel(1)
+announcer_channel.set_endevent(ANNOUNCER_END_EVENT)
+
 
 def end_program() -> None:
     """Ends the program."""
@@ -42,24 +120,187 @@ def end_program() -> None:
     sys.exit()
 
 
-def display_player_image() -> None:
-    """Display the current's player's headshot."""
+def mark_dirty(rect: pygame.Rect) -> None:
+    """Register a part of the screen that was drawn on, so the next flip_display() updates it."""
+
+    # Skipping rects that are already covered (e.g. text drawn over a full-screen background)
+    for dirty_rect in dirty_rects:
+        if dirty_rect.contains(rect):
+            return
+
+    dirty_rects.append(rect)
+
+
+def add_widget(rect: pygame.Rect, action: tuple) -> None:
+    """Make a part of the screen clickable: clicking inside 'rect' makes wait_for_action() return 'action'."""
+
+    widget_rects.append(rect)
+    widget_actions.append(action)
+
+
+def clear_widgets() -> None:
+    """Forget the previous screen's clickable parts (called when a new screen is drawn)."""
+
+    widget_rects.clear()
+    widget_actions.clear()
+
+
+def widget_at(position: tuple[int, int]) -> Optional[tuple]:
+    """Return the action of the widget at the given position (e.g. ("answer", 2)), or None if nothing is there."""
+
+    # collidelist() checks every widget in one call, returning the index of the first one that was clicked (or -1)
+    index = pygame.Rect(position, (1, 1)).collidelist(widget_rects)
+
+    return widget_actions[index] if index != -1 else None
+
+
+def next_event() -> pygame.event.Event:
+    """Return the next event, sleeping until one arrives (so the game uses no CPU while it waits for the user).
+
+    While there's work left (see run_idle_task()), one task is run whenever no event is waiting instead.
+    """
+
+    while idle_tasks:
+        # poll() returns NOEVENT straight away if nothing has happened
+        event = pygame.event.poll()
+        if event.type != pygame.NOEVENT:
+            return event
+
+        run_idle_task()
+
+    return pygame.event.wait()
+
+
+def wait_for_action(*actions: str) -> tuple:
+    """Wait for the user to do one of the given things on the current screen, and return it.
+
+    The actions are the widgets' (e.g. "answer" -> ("answer", 2)), plus "enter" for the ENTER key. Closing the window
+    ends the program from any screen.
+    """
+
+    while True:
+        event = next_event()
+
+        if event.type == pygame.QUIT:
+            end_program()
+
+        # The announcer's call can still be playing after the user moved on
+        elif event.type == ANNOUNCER_END_EVENT:
+            restore_music_volume()
+
+        elif event.type == pygame.KEYDOWN:
+            if event.key == OVERLAY_KEY:
+                toggle_overlay(event)
+                flip_display()      # Shows/hides the overlay straight away
+
+            elif event.key == pygame.K_RETURN and "enter" in actions:
+                return ("enter",)
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            action = widget_at(event.pos)
 
-    player_img = pygame.image.load(get_file_path(os.path.join("Images", "curr_player.jpg"))).convert()
-    screen.blit(player_img, (50, 125))
+            if action is not None and action[0] in actions:
+                return action
 
-    pygame.display.update()
+
+def flip_display() -> None:
+    """Update only the parts of the window that changed, or nothing at all if no drawing happened."""
+
+    global first_frame_shown, overlay_rect
+
+    # Uncovering whatever the overlay was drawn over last frame
+    if overlay_rect is not None:
+        mark_dirty(overlay_rect)
+        overlay_rect = None
+
+    if overlay_on:
+        overlay_rect, covered = draw_overlay()
+        dirty_rects.append(overlay_rect)
+
+    if dirty_rects:
+        pygame.display.update(dirty_rects)
+        dirty_rects.clear()
+
+        if not first_frame_shown:
+            first_frame_shown = True
+            report_time_to_first_frame()
+
+    # Putting back what the overlay covered, so only the window shows the overlay
+    if overlay_rect is not None:
+        screen.blit(covered, overlay_rect)
+
+
+def draw_overlay() -> tuple[pygame.Rect, pygame.Surface]:
+    """Draw the performance overlay. Return where it was drawn & a copy of what it covered."""
+
+    # Frames are only drawn when the user does something, so the time spent on the last one says more than an FPS
+    lines = [f"Frame: {last_frame_ms:.1f} ms"]
+    lines.extend(f"{stage}: {duration:.1f} ms" for stage, duration in list(last_question.items()))
+
+    labels = [fonts['overlay_font'].render(line, True, colours['WHITE']) for line in lines]
+    line_height = fonts['overlay_font'].get_linesize()
+
+    rect = pygame.Rect(10, 60, max(label.get_width() for label in labels) + 10, line_height * len(labels) + 10)
+    rect = rect.clip(screen.get_rect())
+    covered = screen.subsurface(rect).copy()
+
+    screen.fill(colours['BLACK'], rect)
+    for i, label in enumerate(labels):
+        screen.blit(label, (rect.x + 5, rect.y + 5 + i * line_height))
+
+    return rect, covered
+
+
+def toggle_overlay(event: pygame.event.Event) -> None:
+    """Show/hide the performance overlay when F3 is pressed."""
+
+    global overlay_on
+
+    if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+        overlay_on = not overlay_on
+
+
+def report_time_to_first_frame() -> None:
+    """Print how long it took from launch until the first frame was shown, and add it to the startup log."""
+
+    time_to_first_frame = time.perf_counter() - STARTUP_TIME
+
+    # The PyInstaller build unpacks itself into a new temporary folder before Python even starts,
+    # so that folder's creation time is a closer estimate of when the game was launched
+    if hasattr(sys, '_MEIPASS'):
+        time_to_first_frame = max(time_to_first_frame, time.time() - os.stat(sys._MEIPASS).st_ctime)
+
+    print(f"Time to first frame: {time_to_first_frame * 1000:.0f} ms")
+
+    try:
+        os.makedirs(get_cache_path(""), exist_ok=True)
+        with open(get_cache_path("startup_times.jsonl"), 'a') as log:
+            log.write(json.dumps({'time': time.time(), 'time_to_first_frame_ms': time_to_first_frame * 1000,
+                                  'frozen': hasattr(sys, '_MEIPASS')}) + "\n")
+    except OSError:
+        pass
+
+
+def load_headshot(headshot: bytes) -> pygame.Surface:
+    """Decode the bytes of a player's headshot straight into a Surface, without writing them to a file."""
+
+    # The "namehint" tells pygame the bytes are a PNG, since there's no file extension to go off
+    return pygame.image.load(io.BytesIO(headshot), "headshot.png").convert()
+
+
+def display_player_image(player_img: pygame.Surface) -> None:
+    """Display the current's player's headshot."""
+
+    mark_dirty(screen.blit(player_img, (50, 125)))
 
 # Not used
 def draw_clue_button() -> None:
     """DRAW the CLUE button."""
 
     # Drawing a red circle & "clue" as text
-    pygame.draw.circle(screen, 'RED', (175, 400), 50)
-    clue_label = fonts['small_font'].render("CLUE", True, colours['WHITE'])
-    screen.blit(clue_label, (145, 380))
-
-    pygame.display.update()
+    mark_dirty(pygame.draw.circle(screen, 'RED', (175, 400), 50))
+    clue_label = render_text('small_font', "CLUE", colours['WHITE'])
+    mark_dirty(screen.blit(clue_label, (145, 380)))
 
 
 def display_options(choices_list: list[str]) -> None:
@@ -72,126 +313,234 @@ def display_options(choices_list: list[str]) -> None:
         # Draw a rectangle around each option
         # Parameters: (screen, colour, (x, y, width, height))
         button_rect = pygame.Rect(start_x, 80 + i * (40 + vertical_spacing), 400, 65)
-        pygame.draw.rect(screen, colours['BLUE'], button_rect)
+        mark_dirty(pygame.draw.rect(screen, colours['BLUE'], button_rect))
+        add_widget(button_rect, ("answer", i))
 
-        button_text = fonts['big_font'].render(name, True, colours['WHITE'])    # Draws the text
+        button_text = render_text('big_font', name, colours['WHITE'])    # Draws the text
         rect_text = button_text.get_rect(center=button_rect.center)     # Centers the text inside the button
-        screen.blit(button_text, rect_text)     # Draws the current text on the screen in a centered position
-
-        pygame.display.update()
+        mark_dirty(screen.blit(button_text, rect_text))     # Draws the current text on the screen in a centered position
 
 
 def get_difficulty() -> str:
     """Display the screen that allows the player to choose between a CASUAL and DIEHARD gameplay mode"""
 
+    clear_widgets()
+
     # Adds a background image of basketballs
-    display_scaled_image(get_file_path(os.path.join("Images", "Backgrounds", "basketballs.jpg")), (900, 500), (0, 0))
+    display_scaled_image("Images/Backgrounds/basketballs.jpg", (900, 500), (0, 0))
 
     # The last parameter creates a WHITE background for the text
-    screen_text = fonts["title_font"].render("PICK A MODE:", True, colours['BLACK'], (255, 255, 255))
-    screen.blit(screen_text, (100, 50))
+    screen_text = render_text("title_font", "PICK A MODE:", colours['BLACK'], (255, 255, 255))
+    mark_dirty(screen.blit(screen_text, (100, 50)))
 
     # Displaying images of MJ and a random NBA player
-    casual_player_img = pygame.image.load(get_file_path(os.path.join("Images", "casual_player_img.png"))).convert()
-    screen.blit(casual_player_img, (100, 150))
+    # Clicking anywhere on a mode's image (or label) picks that mode
+    casual_player_img = get_image("Images/casual_player_img.png", alpha=False)
+    mark_dirty(screen.blit(casual_player_img, (100, 150)))
+    add_widget(pygame.Rect(100, 150, 300, 300), ("mode", "casual"))
 
-    diehard_player_img = pygame.image.load(get_file_path(os.path.join("Images", "diehard_player_img.jpg"))).convert()
-    screen.blit(diehard_player_img, (500, 150))
+    diehard_player_img = get_image("Images/diehard_player_img.jpg", alpha=False)
+    mark_dirty(screen.blit(diehard_player_img, (500, 150)))
+    add_widget(pygame.Rect(500, 150, 300, 300), ("mode", "diehard"))
 
     # Creating "CASUAL" and "DIEHARD" labels
-    casual_label = fonts["big_font"].render("CASUAL", True, colours['BLACK'], (255, 255, 255))
-    screen.blit(casual_label, (175, 400))
-
-    diehard_label = fonts["big_font"].render("DIEHARD", True, colours['BLACK'], (255, 255, 255))
-    screen.blit(diehard_label, (575, 400))
-
-    pygame.display.update()
+    casual_label = render_text("big_font", "CASUAL", colours['BLACK'], (255, 255, 255))
+    mark_dirty(screen.blit(casual_label, (175, 400)))
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                end_program()
+    diehard_label = render_text("big_font", "DIEHARD", colours['BLACK'], (255, 255, 255))
+    mark_dirty(screen.blit(diehard_label, (575, 400)))
 
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                pos_x, pos_y = pygame.mouse.get_pos()
+    flip_display()
 
-                if 100 <= pos_x <= 400 and 150 <= pos_y <= 450:
-                    return "casual"
-                elif 500 <= pos_x <= 800 and 150 <= pos_y <= 450:
-                    return "diehard"
+    # The rest of the game keeps loading until the user picks a mode
+    return wait_for_action("mode")[1]
 
 
 def check_correct_ans(correct_ans: str, user_ans: str, nba_images: tuple[list, list], audio_calls: tuple[list, list]) -> Optional[bool]:
     """Display whether the user's answer is CORRECT or WRONG."""
 
-    if correct_ans == user_ans:
-        display_scaled_image(get_file_path(os.path.join("Images", "Backgrounds", "basketball_net.jpg")), (900, 500), (0, 0))
-        is_correct = True
-        display_message = fonts['big_font'].render("CORRECT!", True, colours['GREEN'], (255, 255, 0))
-        display_nba_moment(nba_images[0])   # nba_images is a tuple of (clutch_images, choke_images)  # audio_calls is a tuple of (good calls, bad calls)
+    with span("render_answer"):
+        # The result screen has no buttons
+        clear_widgets()
 
-    else:
-        display_scaled_image(get_file_path(os.path.join("Images", "Backgrounds", "man_disappointed.jpg")), (900, 500), (0, 0))
-        is_correct = False
-        display_message = fonts['big_font'].render("WRONG!", True, colours['RED'], (255, 255, 0))
-        display_nba_moment(nba_images[1])
+        if correct_ans == user_ans:
+            display_scaled_image("Images/Backgrounds/basketball_net.jpg", (900, 500), (0, 0))
+            is_correct = True
+            display_message = render_text('big_font', "CORRECT!", colours['GREEN'], (255, 255, 0))
+            display_nba_moment(nba_images[0])   # nba_images is a tuple of (clutch_images, choke_images)  # audio_calls is a tuple of (good calls, bad calls)
 
-    screen.blit(display_message, (350, 185))
+        else:
+            display_scaled_image("Images/Backgrounds/man_disappointed.jpg", (900, 500), (0, 0))
+            is_correct = False
+            display_message = render_text('big_font', "WRONG!", colours['RED'], (255, 255, 0))
+            display_nba_moment(nba_images[1])
 
-    press_enter_msg = fonts['small_font'].render('(Press ENTER to continue)', True, colours['GREY'], (255, 255, 0))
-    screen.blit(press_enter_msg, (275, 250))
+        mark_dirty(screen.blit(display_message, (350, 185)))
 
-    pygame.display.update()
+        press_enter_msg = render_text('small_font', '(Press ENTER to continue)', colours['GREY'], (255, 255, 0))
+        mark_dirty(screen.blit(press_enter_msg, (275, 250)))
+
+        flip_display()
 
     # Playing the announcer's call after updating the result screen
     # audio_calls is a tuple of (good calls, bad calls)
-    if is_correct:
-        play_announcer_sound(audio_calls[0])
+    with span("play_announcer"):
+        if is_correct:
+            play_announcer_sound(audio_calls[0])
+        else:
+            play_announcer_sound(audio_calls[1])
+
+    wait_for_action("enter")
+    return is_correct
+
+def asset_file(key: str):
+    """Return what pygame should load an asset from: its bytes in the bundle, or the path of its file."""
+
+    if asset_bundle is not None and key in asset_bundle:
+        return io.BytesIO(asset_bundle.read(key))
+
+    return get_file_path(os.path.join(*key.split("/")))
+
+
+def asset_keys(folder: str) -> list[str]:
+    """Return the keys of the assets in one of the game's folders (e.g. "Audio/Good" -> ["Audio/Good/Bang.mp3", ...])."""
+
+    if asset_bundle is not None:
+        return asset_bundle.keys(folder)
+
+    return folder_keys(folder)
+
+
+def get_image(key: str, size: Optional[tuple[int, int]] = None, alpha: bool = True) -> pygame.Surface:
+    """Return the image with the given key (e.g. "Images/mamba_out.jpg") converted for the screen (and scaled to 'size'),
+    loading it only once."""
+
+    global asset_cache_bytes
+
+    cache_key = (key, size, alpha)
+
+    if cache_key in asset_cache:
+        asset_cache.move_to_end(cache_key)    # Marks the image as the most recently used
+        return asset_cache[cache_key]
+
+    # The key's extension tells pygame what kind of image the bundle's bytes are
+    image = pygame.image.load(asset_file(key), key)
+
+    # convert_alpha() keeps the image's transparency, while convert() is faster for images that have none
+    if alpha:
+        image = image.convert_alpha()
     else:
-        play_announcer_sound(audio_calls[1])
+        image = image.convert()
 
-    while True:
+    # The bundle's images are already at their on-screen size
+    if size is not None and image.get_size() != size:
+        image = pygame.transform.smoothscale(image, size)
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                end_program()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    return is_correct
+    asset_cache[cache_key] = image
+    asset_cache_bytes += image.get_width() * image.get_height() * image.get_bytesize()
 
-def display_scaled_image(file_path: str, new_size: tuple[int, int], position: tuple[int, int]) -> None:
-    """Scale the given image to 'new_size' & draw it to the screen at 'position'. """
+    # Dropping the oldest images until the cache fits in its budget again
+    while asset_cache_bytes > ASSET_CACHE_BYTES and len(asset_cache) > 1:
+        _, old_image = asset_cache.popitem(last=False)
+        asset_cache_bytes -= old_image.get_width() * old_image.get_height() * old_image.get_bytesize()
 
-    unscaled_img = pygame.image.load(file_path).convert_alpha()
-    scaled_img = pygame.transform.smoothscale(unscaled_img, new_size)
-    screen.blit(scaled_img, position)
+    return image
 
 
+def queue_startup_tasks(nba_images: tuple[list, list]) -> None:
+    """Queue up the loading that can wait until after the first frame (see run_idle_task())."""
 
-def load_clutch_images() -> list:
-    """Return a list of valid file paths for the images in the 'Clutch Moments' folder. """
+    idle_tasks.append(start_background_loading)
 
-    clutch_moments = []
+    # Loading & scaling every static image, so no frame during the game has to read or scale one
+    for key, size in IMAGE_SIZES.items():
+        idle_tasks.append(partial(get_image, key, size, key not in OPAQUE_IMAGES))
 
-    # Traverses through "Clutch Moments" folder and creates a list of valid file paths
-    # e.g. ["Clutch Moments/jordan_1998.jpg", "Clutch Moments/kawhi_2019.jpg"]
-    for filename in os.listdir(get_file_path(os.path.join("Images", "Clutch Moments"))):
-        img_path = get_file_path(os.path.join("Images", "Clutch Moments", filename))
-        clutch_moments.append(img_path)
+    # nba_images is a tuple of (clutch_images, choke_images)
+    for image_key in nba_images[0] + nba_images[1]:
+        idle_tasks.append(partial(get_image, image_key, (271, 153)))
 
-    return clutch_moments
 
+def run_idle_task() -> None:
+    """Run the next idle task, if there are any left (called while the screens wait for input)."""
+
+    if idle_tasks:
+        idle_tasks.pop(0)()
+
+
+def finish_idle_tasks() -> None:
+    """Run every idle task that's left (e.g. when the user moved on before the game was idle long enough)."""
+
+    while idle_tasks:
+        run_idle_task()
+
+
+def finish_startup() -> None:
+    """Run every startup task that's left & wait for the audio to finish decoding."""
+
+    finish_idle_tasks()
+    audio_thread.join()
+
+
+def start_background_loading() -> None:
+    """Start preparing the first questions & decoding the audio in background threads."""
+
+    global audio_thread
+
+    # Importing the backend is left until now, since it's the slowest import
+    from Backend import start_prefetching
+    start_prefetching()
+
+    audio_thread = threading.Thread(target=load_audio, daemon=True)
+    audio_thread.start()
+
+
+def load_audio() -> None:
+    """Decode the theme music & the announcer calls, starting the music as soon as it's ready."""
+
+    global background_music, announcer_calls
+
+    background_music = pygame.mixer.Sound(asset_file("Audio/NBA On NBC Theme.mp3"))
+    play_music()
+
+    announcer_calls = load_announcer_calls()
 
-def load_choke_images() -> list:
-    """Return a list of valid file paths for the images in the 'Choke Moments' folder. """
 
-    choke_moments = []
+def render_text(font_name: str, text: str, colour: tuple, background: Optional[tuple] = None) -> pygame.Surface:
+    """Return the rendered label of 'text', only rendering each unique label once."""
 
-    for filename in os.listdir(get_file_path(os.path.join("Images", "Choke Moments"))):
-        img_path = get_file_path(os.path.join("Images", "Choke Moments", filename))
-        choke_moments.append(img_path)
+    key = (font_name, text, colour, background)
 
-    return choke_moments
+    if key in text_cache:
+        text_cache.move_to_end(key)
+        return text_cache[key]
+
+    label = fonts[font_name].render(text, True, colour, background)
+    text_cache[key] = label
+
+    if len(text_cache) > TEXT_CACHE_SIZE:
+        text_cache.popitem(last=False)
+
+    return label
+
+
+def display_scaled_image(key: str, new_size: tuple[int, int], position: tuple[int, int]) -> None:
+    """Scale the given image to 'new_size' & draw it to the screen at 'position'. """
+
+    mark_dirty(screen.blit(get_image(key, new_size), position))
+
+
+def load_clutch_images() -> list:
+    """Return a list of the keys of the images in the 'Clutch Moments' folder. """
+
+    # e.g. ["Images/Clutch Moments/allen_2013.jpg", "Images/Clutch Moments/jordan_1998.jpg", ...]
+    return asset_keys("Images/Clutch Moments")
+
+
+def load_choke_images() -> list:
+    """Return a list of the keys of the images in the 'Choke Moments' folder. """
+
+    return asset_keys("Images/Choke Moments")
 
 
 def display_nba_moment(images_list: list) -> None:
@@ -204,135 +553,177 @@ def display_nba_moment(images_list: list) -> None:
     display_scaled_image(random_image, (271, 153), (540, 325))
 
 
-def update_points(is_prev_correct: bool, difficulty: str, points: int) -> int:
-    """Update point total based on whether their answer was correct/wrong."""
+def display_points_change(points_change: int, total_points: int) -> None:
+    """Display the user's new point total, and how much their last answer changed it by (e.g. +100 or -50)."""
 
-    # convert_alpha() removes the white background & makes the image transparent
-    up_arrow_img = pygame.image.load(get_file_path(os.path.join("Images", "green_arrow.png"))).convert_alpha()
-    scaled_up_arrow = pygame.transform.smoothscale(up_arrow_img, (15, 15))
+    if points_change > 0:
+        # convert_alpha() removes the white background & makes the image transparent
+        scaled_up_arrow = get_image("Images/green_arrow.png", (15, 15))
+        points_change_text = render_text("points_font_2", f"{points_change}", colours['GREEN'])
 
-    down_arrow_img = pygame.image.load(get_file_path(os.path.join("Images", "red_arrow.png"))).convert_alpha()
-    scaled_down_arrow = pygame.transform.smoothscale(down_arrow_img, (15, 15))
-
-    if is_prev_correct:
-
-        if difficulty == "casual":
-            points += 100
-            points_change_text = fonts["points_font_2"].render(f"100", True, colours['GREEN'])
-        else:
-            points += 200
-            points_change_text = fonts["points_font_2"].render("200", True, colours['GREEN'])
-
-        screen.blit(scaled_up_arrow, (50, 473))
+        mark_dirty(screen.blit(scaled_up_arrow, (50, 473)))
 
     else:
-        points -= 50
-        points_change_text = fonts["points_font_2"].render("50", True, colours['RED'])
+        scaled_down_arrow = get_image("Images/red_arrow.png", (15, 15))
+        points_change_text = render_text("points_font_2", f"{-points_change}", colours['RED'])
 
-        screen.blit(scaled_down_arrow, (50, 473))
+        mark_dirty(screen.blit(scaled_down_arrow, (50, 473)))
 
     # Printing the user's point total
-    display_points(points)
+    display_points(total_points)
 
     # Displaying how much the user's point total went UP/DOWN by
-    screen.blit(points_change_text, (75, 468))
-
-    pygame.display.update()
+    mark_dirty(screen.blit(points_change_text, (75, 468)))
 
-    return points
 
 def display_points(total_points: int) -> None:
     """Displaying the user's current point total."""
 
-    points_text = fonts["points_font"].render(f"Points:  {total_points}", True, colours['YELLOW'])
-    screen.blit(points_text, (50, 425))
+    points_text = render_text("points_font", f"Points:  {total_points}", colours['YELLOW'])
+    mark_dirty(screen.blit(points_text, (50, 425)))
 
-def fetch_next_player(difficulty: str, music_playing: bool) -> tuple:
-    """Update the screen to show the next question. Return the player & the list of options."""
+def wait_for_question(difficulty: str) -> tuple:
+    """Return the next question for the given mode, from the prefetch threads."""
 
-    # Uploading a background image
-    screen.fill(colours['BLACK'])
-    display_scaled_image(get_file_path(os.path.join("Images", "Backgrounds", "dark_background.jpg")), (900, 500), (0, 0))
+    from Backend import get_question
 
-    for event in pygame.event.get():
+    # Taking the next prepared question, based on whether the user clicked "CASUAL" or "DIEHARD"
+    # (the player & their options were already fetched by the prefetch threads)
+    with span("wait_for_question") as waited:
+        while True:
+            try:
+                player_obj, choices_list = get_question(difficulty, timeout=QUESTION_POLL_SECONDS)
+                break
 
-        if event.type == pygame.QUIT:
-            end_program()
+            # Keeping the window responsive while the question isn't ready yet, so it can still be closed
+            # (pump() & peek() leave the other events in the queue, so an ENTER pressed in the meantime isn't lost)
+            except queue.Empty:
+                pygame.event.pump()
 
-    # Creating a player object based on whether the user clicked "CASUAL" or "DIEHARD"
-    player_obj = get_player(difficulty)
-    display_player_image()
+                if pygame.event.peek(pygame.QUIT):
+                    end_program()
 
-    choices_list = get_options(player_obj.full_name)
-    display_options(choices_list)
+    # The overlay now shows this question's stages (including the ones from the prefetch thread that prepared it)
+    show_question(player_obj.id, wait_for_question=waited['duration_ms'])
 
-    # Shows whether the music is playing
-    draw_music_icon(music_playing)
+    return player_obj, choices_list
 
-    # Give the user the option to quit the game OR change the mode
-    draw_quit_button()
-    draw_switch_mode_button()
 
-    pygame.display.update()
+def take_question(difficulty: str) -> tuple:
+    """Return the question composed while the result screen was up, or wait for a new one (this is the GameEngine's
+    source of questions)."""
 
-    return player_obj, choices_list, music_playing
+    global ready_question
 
+    if ready_question is not None and ready_question[0] == difficulty:
+        question, ready_question = ready_question[1], None
+        return question
 
-def draw_music_icon(music_playing: bool) -> None:
-    """Displays an image of Homer Simpson, based on whether the music is ON/OFF."""
+    return wait_for_question(difficulty)
 
-    # Drawing a black rectangle to cover up the previous icon
-    black_rect = pygame.Rect(810, 420, 60, 60)
-    pygame.draw.rect(screen, colours['BLACK'], black_rect)
 
-    # Shows that the music is ON
-    if music_playing:
+@contextmanager
+def drawing_off_screen(surface: pygame.Surface):
+    """Make every drawing function draw onto 'surface' instead of the window, inside a 'with' block."""
 
-        music_channel.set_volume(1.0)
+    global screen
 
-        display_scaled_image(get_file_path(os.path.join("Images", "simpson_vibing.png")), (60, 60), (810, 420))
+    window, screen = screen, surface
+    marked = len(dirty_rects)
 
-    else:
+    try:
+        yield surface
+    finally:
+        screen = window
 
-        # Muting the volume
-        music_channel.set_volume(0.0)
+        # The window itself didn't change, so nothing drawn off-screen needs updating
+        del dirty_rects[marked:]
 
-        display_scaled_image(get_file_path(os.path.join("Images", "simpson_bored.png")), (60, 60), (810, 420))
 
+def compose_next_question(engine: GameEngine, music_playing: bool) -> None:
+    """Take the next question & draw its whole screen (with the new point total) off-screen (runs as an idle task)."""
 
-    pygame.display.update()
+    global ready_question, next_frame
 
+    ready_question = engine.mode, wait_for_question(engine.mode)
+    player_obj, choices_list = ready_question[1]
 
-def play_music() -> None:
-    """Plays the background song & allows the user to mute the music"""
+    # The question's buttons are registered now too, ready for when its screen is swapped in
+    with drawing_off_screen(pygame.Surface(screen.get_size())) as frame:
+        fetch_next_player(player_obj, choices_list, music_playing)
 
-    music_channel.play(background_music, loops=-1)
+        # Display the updated points total
+        display_points_change(engine.last_points_change, engine.points)
 
+    next_frame = frame
+
+
+def show_next_frame() -> None:
+    """Swap in the screen that compose_next_question() drew, in ONE blit."""
+
+    global next_frame
+
+    mark_dirty(screen.blit(next_frame, (0, 0)))
+    next_frame = None
 
-def load_announcer_calls() -> Optional[tuple]:
-    """Return two lists consisting of the filenames of the good & bad announcer calls."""
 
-    good_calls = []
-    bad_calls = []
+def fetch_next_player(player_obj, choices_list: list[str], music_playing: bool) -> None:
+    """Update the screen to show the given question."""
 
-    # Traversing through the subfolders in "Audio" folder
-    for file in os.listdir(get_file_path("Audio")):
+    # Uploading a background image
+    clear_widgets()
+    mark_dirty(screen.fill(colours['BLACK']))
+    display_scaled_image("Images/Backgrounds/dark_background.jpg", (900, 500), (0, 0))
+
+    with span("decode_headshot"):
+        player_img = load_headshot(player_obj.headshot)
 
-        # Only traverse through good/bad announcer calls
-        if file not in {"Good", "Bad"}:
-            continue
+    with span("render_question"):
+        display_player_image(player_img)
 
-        # Traversing through the folders in each of the subfolders
-        for filename in os.listdir(get_file_path(os.path.join("Audio", file))):
+        display_options(choices_list)
 
-            # Creating a valid filepath (e.g. "Audio/Good/Bang.mp3")
-            filepath = get_file_path(os.path.join("Audio", file, filename))
+        # Shows whether the music is playing
+        draw_music_icon(music_playing)
 
-            if file == "Good":
-                good_calls.append(filepath)
+        # Give the user the option to quit the game OR change the mode
+        draw_quit_button()
+        draw_switch_mode_button()
 
-            elif file == "Bad":
-                bad_calls.append(filepath)
+
+def draw_music_icon(music_playing: bool) -> None:
+    """Displays an image of Homer Simpson, based on whether the music is ON/OFF."""
+
+    # Drawing a black rectangle to cover up the previous icon
+    black_rect = pygame.Rect(810, 420, 60, 60)
+    mark_dirty(pygame.draw.rect(screen, colours['BLACK'], black_rect))
+
+    # The icon is redrawn every time it's clicked, so it's only added as a widget once per screen
+    if ("music",) not in widget_actions:
+        add_widget(black_rect, ("music",))
+
+    # Shows that the music is ON
+    # (the volume is changed when the icon is clicked, since the icon is also drawn off-screen for the next question)
+    if music_playing:
+        display_scaled_image("Images/simpson_vibing.png", (60, 60), (810, 420))
+
+    else:
+        display_scaled_image("Images/simpson_bored.png", (60, 60), (810, 420))
+
+
+def play_music() -> None:
+    """Plays the background song & allows the user to mute the music"""
+
+    music_channel.play(background_music, loops=-1)
+
+
+def load_announcer_calls() -> Optional[tuple]:
+    """Return two lists consisting of the decoded Sounds of the good & bad announcer calls."""
+
+    # Decoding each MP3 once here, rather than every time the call is played
+    # (e.g. "Audio/Good/Bang.mp3")
+    good_calls = [pygame.mixer.Sound(asset_file(key)) for key in asset_keys("Audio/Good")]
+    bad_calls = [pygame.mixer.Sound(asset_file(key)) for key in asset_keys("Audio/Bad")]
 
     return good_calls, bad_calls
 
@@ -343,19 +734,15 @@ def play_announcer_sound(audio_list: list) -> None:
     if music_on:
         music_channel.set_volume(0.2)
 
-    # Randomly choosing an audio file from the list & turning it into a Sound object
+    # Randomly choosing one of the decoded calls
+    # The call plays in the background, so the game keeps responding while it's playing
     random_announcer_call = random.choice(audio_list)
-    sound = pygame.mixer.Sound(random_announcer_call)
+    announcer_channel.play(random_announcer_call)
 
-    # Creating a 2nd channel to control the announcer's audio
-    announcer_channel = pygame.mixer.Channel(1)
-    announcer_channel.play(sound)
 
-    # Check every 10 ms if the announcer_channel is still being played
-    while announcer_channel.get_busy():
-        pygame.time.delay(10)
+def restore_music_volume() -> None:
+    """Reset the music_channel's volume to its original state, once the announcer's call has finished."""
 
-    # Resetting the music_channel's volume to its original state
     if music_on:
         music_channel.set_volume(1.0)
 
@@ -363,92 +750,84 @@ def play_announcer_sound(audio_list: list) -> None:
 def intro_screen() -> None:
     """Display disclaimers & instructions before the game starts."""
 
-    screen.fill(colours['BLACK'])
+    clear_widgets()
+    mark_dirty(screen.fill(colours['BLACK']))
 
-    pygame.draw.rect(screen, colours['YELLOW'], (0, 0, 900, 100))
+    mark_dirty(pygame.draw.rect(screen, colours['YELLOW'], (0, 0, 900, 100)))
 
     # Creating a SHADOW of the game title
-    shadow = fonts['title_font'].render("hOOpster", True, colours['WHITE'])
-    screen.blit(shadow, (322, 30))
+    shadow = render_text('title_font', "hOOpster", colours['WHITE'])
+    mark_dirty(screen.blit(shadow, (322, 30)))
 
-    game_title = fonts['title_font'].render("hOOpster", True, colours['RED'])
-    screen.blit(game_title, (325, 35))
+    game_title = render_text('title_font', "hOOpster", colours['RED'])
+    mark_dirty(screen.blit(game_title, (325, 35)))
 
-    screen.blit(fonts['bold_font'].render("BEFORE YOU START...",
-                                           True, colours['WHITE']), (20, 115))
+    mark_dirty(screen.blit(render_text('bold_font', "BEFORE YOU START...", colours['WHITE']), (20, 115)))
 
     # Message 1: Mute/unmute music
-    message_1 = fonts['small_font'].render("Toggle between          and          to mute/unmute music",
-                                           True, colours['BLUE'])
-    screen.blit(message_1, (50, 190))
+    message_1 = render_text('small_font', "Toggle between          and          to mute/unmute music", colours['BLUE'])
+    mark_dirty(screen.blit(message_1, (50, 190)))
 
     # Image of "music on" icon
-    display_scaled_image(get_file_path(os.path.join("Images", "simpson_vibing.png")), (60, 60), (225, 175))
+    display_scaled_image("Images/simpson_vibing.png", (60, 60), (225, 175))
 
     # Image of "music off" icon
-    display_scaled_image(get_file_path(os.path.join("Images", "simpson_bored.png")), (60, 60), (340, 175))
+    display_scaled_image("Images/simpson_bored.png", (60, 60), (340, 175))
 
     # Message 2: Points gained/lost for each question
-    message_2 = fonts['small_font'].render("        for \"CASUAL\" mode,          for \"DIEHARD\","
-                                           "        for wrong guesses", True, colours['BLUE'])
-    screen.blit(message_2, (50, 290))
+    message_2 = render_text('small_font', "        for \"CASUAL\" mode,          for \"DIEHARD\","
+                                          "        for wrong guesses", colours['BLUE'])
+    mark_dirty(screen.blit(message_2, (50, 290)))
 
-    points_msg_1 = fonts['points_font_3'].render("+100", True, colours['GREEN'])
-    screen.blit(points_msg_1, (50, 293))
+    points_msg_1 = render_text('points_font_3', "+100", colours['GREEN'])
+    mark_dirty(screen.blit(points_msg_1, (50, 293)))
 
-    points_msg_2 = fonts['points_font_3'].render("+200", True, colours['GREEN'])
-    screen.blit(points_msg_2, (348, 293))
+    points_msg_2 = render_text('points_font_3', "+200", colours['GREEN'])
+    mark_dirty(screen.blit(points_msg_2, (348, 293)))
 
-    points_msg_3 = fonts["points_font_3"].render("-50", True, colours['RED'])
-    screen.blit(points_msg_3, (608, 293))
+    points_msg_3 = render_text("points_font_3", "-50", colours['RED'])
+    mark_dirty(screen.blit(points_msg_3, (608, 293)))
 
     # Telling the user to press enter
-    press_enter_msg = fonts["small_font"].render("(Click ENTER)", True, colours['WHITE'])
-    screen.blit(press_enter_msg, (675, 440))
-
-    pygame.display.update()
+    press_enter_msg = render_text("small_font", "(Click ENTER)", colours['WHITE'])
+    mark_dirty(screen.blit(press_enter_msg, (675, 440)))
 
-    while True:
+    flip_display()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                end_program()
-
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    return
+    # Loading the rest of the game while the user reads the intro
+    wait_for_action("enter")
 
 
 def draw_quit_button() -> None:
     """Draw the quit button."""
 
     rect_button = pygame.Rect(800, 0, 100, 50)
-    pygame.draw.rect(screen, colours['RED'], rect_button)   # Draws a red rectangle on the screen
+    mark_dirty(pygame.draw.rect(screen, colours['RED'], rect_button))   # Draws a red rectangle on the screen
+    add_widget(rect_button, ("quit",))
 
-    button_text = fonts['bold_font'].render("QUIT", True, colours['WHITE'])
+    button_text = render_text('bold_font', "QUIT", colours['WHITE'])
     rect_text = button_text.get_rect(center=rect_button.center)     # Centers the text inside the button
-    screen.blit(button_text, rect_text)
-
-    pygame.display.update()
+    mark_dirty(screen.blit(button_text, rect_text))
 
 
-def quit_game() -> None:
+def quit_game(total_points: int) -> None:
     """Display the player's points before ending the game."""
 
-    screen.fill(colours['BLACK'])
+    clear_widgets()
+    mark_dirty(screen.fill(colours['BLACK']))
 
     # If the user has (-) points, display it in red
-    if player_points >= 0:
-        points_msg = fonts['bold_font'].render(f"You ended with {player_points} points!", True, colours['GREEN'])
+    if total_points >= 0:
+        points_msg = render_text('bold_font', f"You ended with {total_points} points!", colours['GREEN'])
 
     else:
-        points_msg = fonts['bold_font'].render(f"You ended with {player_points} points!", True, colours['RED'])
+        points_msg = render_text('bold_font', f"You ended with {total_points} points!", colours['RED'])
 
-    screen.blit(points_msg, (50, 50))
+    mark_dirty(screen.blit(points_msg, (50, 50)))
 
-    display_scaled_image(get_file_path(os.path.join("Images", "mamba_out.jpg")), (480, 334), (200, 125))
+    display_scaled_image("Images/mamba_out.jpg", (480, 334), (200, 125))
 
-    pygame.display.update()
+    flip_display()
     pygame.time.wait(3000)
 
     end_program()
@@ -457,91 +836,85 @@ def draw_switch_mode_button() -> None:
     """Display a button that allows the user to change the mode mid-game."""
 
     rect_button = pygame.Rect(0, 0, 170, 50)
-    pygame.draw.rect(screen, colours['GREEN'], rect_button)  # Draws a green rectangle on the screen
+    mark_dirty(pygame.draw.rect(screen, colours['GREEN'], rect_button))  # Draws a green rectangle on the screen
+    add_widget(rect_button, ("switch",))
 
-    button_text = fonts['points_font_3'].render("SWITCH MODE", True, colours['WHITE'])
+    button_text = render_text('points_font_3', "SWITCH MODE", colours['WHITE'])
     rect_text = button_text.get_rect(center=rect_button.center)  # Centers the text inside the button
-    screen.blit(button_text, rect_text)
-
-    pygame.display.update()
-
-def switch_mode(game_mode: str) -> str:
-    """Change the mode from 'casual' to 'diehard', and vice versa, and return the new game mode."""
-
-    if game_mode == "casual":
-        game_mode = "diehard"
-    else:
-        game_mode = "casual"
+    mark_dirty(screen.blit(button_text, rect_text))
 
-    return game_mode
+# The game only starts when this file is run (importing it, e.g. from Benchmark.py, just gives access to the screens)
+if __name__ == "__main__":
 
+    # Switches on the trace file, cProfile & tracemalloc if they were asked for (see Tracing.py)
+    start_tracing()
 
-# Loading images (tuple of (clutch images, choke images))
-images = load_clutch_images(), load_choke_images()
+    # Loading images (tuple of (clutch images, choke images))
+    images = load_clutch_images(), load_choke_images()
 
-# Loading announcer calls (tuple of (good calls, bad calls))
-announcer_calls = load_announcer_calls()
+    # The intro is shown first, and the rest of the game (the announcer calls (tuple of (good calls, bad calls)),
+    # the images, and the questions for BOTH modes) is loaded while the user reads it
+    queue_startup_tasks(images)
 
-play_music()
-intro_screen()
-mode = get_difficulty()
+    # The game's rules & round flow live in the engine, and this file only draws them & turns input into actions
+    engine = GameEngine(take_question)
 
-# Fetch the first NBAPlayer object
-player, choices, music_on = fetch_next_player(mode, music_on)
-display_points(player_points)
+    intro_screen()
+    engine.continue_intro()
 
-# Game loop
-running = True
-while running:
+    mode = get_difficulty()
+    finish_startup()
 
-    for event in pygame.event.get():
+    # Fetch the first NBAPlayer object
+    engine.pick_mode(mode)
+    fetch_next_player(engine.player, engine.choices, music_on)
+    display_points(engine.points)
 
-        if event.type == pygame.QUIT:
-            running = False
-
-        elif event.type == pygame.MOUSEBUTTONDOWN:
+    # Game loop
+    # Nothing is redrawn until the user does something, and the game sleeps until they do
+    while engine.state == QUESTION:
+        action = wait_for_action("quit", "switch", "answer", "music")
+        frame_start = time.perf_counter()
 
-            # Checks if the user clicked on the options
-            click_x, click_y = pygame.mouse.get_pos()
+        if action[0] == "quit":
+            engine.quit()
+            quit_game(engine.points)
 
-            for i in range(len(choices)):
-                button_y = 80 + (i * 90)   # Starting y-position of current option box
+        elif action[0] == "switch":
+            engine.switch_mode()
 
-                # Checks if the user clicked on the "QUIT" button
-                if 800 <= click_x <= 900 and 0 <= click_y <= 50:
-                    quit_game()
+            # Display the next question & options
+            fetch_next_player(engine.player, engine.choices, music_on)
+            display_points(engine.points)
 
-                # Switch the game mode
-                elif 0 <= click_x <= 170 and 0 <= click_y <= 50:
-                    mode = switch_mode(mode)
+        elif action[0] == "answer":
+            engine.answer(action[1])
+            user_answer = engine.choices[action[1]]    # Storing the user's response
 
-                    # Display the next question & options
-                    player, choices, music_on = fetch_next_player(mode, music_on)
-                    display_points(player_points)
+            # The next question's screen is drawn off-screen while the user reads the result
+            idle_tasks.append(partial(compose_next_question, engine, music_on))
 
-                    break
+            check_correct_ans(engine.player.full_name, user_answer, images, announcer_calls)
 
-                elif 400 <= click_x <= 800 and button_y <= click_y <= button_y + 65:
-                    user_answer = choices[i]    # Storing the user's response
+            # The user may have pressed ENTER before the game had a moment to draw it
+            finish_idle_tasks()
 
-                    is_correct = check_correct_ans(player.full_name, user_answer, images, announcer_calls)
+            # Display the next question & options (already drawn, with the updated points total)
+            engine.next_question()
+            show_next_frame()
 
-                    # Display the next question & options
-                    player, choices, music_on = fetch_next_player(mode, music_on)
+        # Toggles between music ON/OFF icon
+        elif action[0] == "music":
+            music_on = not music_on
 
-                    # Display the updated points total
-                    player_points = update_points(is_correct, mode, player_points)
+            # Muting/unmuting the music
+            music_channel.set_volume(1.0 if music_on else 0.0)
 
-            # Checks whether the user clicked on the Simpson image and toggles between music ON/OFF icon
-            if 810 <= click_x <= 870 and 420 <= click_y <= 480:
-                music_on = not music_on
-                draw_music_icon(music_on)   # Immediately changes the icon to indicate that the music is MUTED (and vice versa)
+            draw_music_icon(music_on)   # Immediately changes the icon to indicate that the music is MUTED (and vice versa)
 
-    pygame.display.update()
+        flip_display()
+        last_frame_ms = (time.perf_counter() - frame_start) * 1000
 
-    clock.tick(60)  # Prevents glitches by ensuring the game runs at a reasonable speed
-
-
-# End the program
-end_program()
 
+    # End the program
+    end_program()
@@ -10,4 +10,12 @@ def get_file_path (relative_path):
         # Happens when running in PyCharm
         base_path = os.path.abspath(".")
 
-    return os.path.join(base_path, relative_path)
\ No newline at end of file
+    return os.path.join(base_path, relative_path)
+
+def get_cache_path (relative_path):
+    "Returns a file path inside the game's cache folder, which (unlike the PyInstaller bundle) survives between sessions."
+
+    # The PyInstaller folder is deleted when the game closes, so the cache lives in the user's home folder instead
+    base_path = os.environ.get("HOOPSTER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".hoopster"))
+
+    return os.path.join(base_path, relative_path)
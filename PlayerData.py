@@ -0,0 +1,214 @@
+"""This file will contain the compact binary format of the player datasets, and the converter from the JSON files.
+
+A '.bin' file holds a list of players (in the same format as nba_api's player dicts) as columns:
+
+    header      b"HOOPDATA", version (uint16), reserved (uint16), number of players (uint32), size of the names (uint32)
+    ids         int32 per player
+    flags       uint8 per player (bit 0 = is_active), padded to a multiple of 4 bytes
+    offsets     int32 per name, plus one at the end: player i's full, first & last names are the UTF-8 bytes
+                names[offsets[3i]:offsets[3i + 1]], names[offsets[3i + 1]:offsets[3i + 2]] & names[offsets[3i + 2]:offsets[3i + 3]]
+    names       every name, one after the other, as UTF-8
+
+Everything is little-endian. The files are memory-mapped, so loading one doesn't read or copy it, and games running at
+the same time share the same pages of memory.
+
+Usage:  python PlayerData.py      (converts 'Datasets/casual_players.json', 'Datasets/diehard_players.json' & nba_api's
+                                   list of every player into .bin files)
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Iterator, Optional
+import numpy as np
+from Installer import get_file_path
+
+
+MAGIC = b"HOOPDATA"
+VERSION = 1
+HEADER = struct.Struct("<8sHHII")
+
+ACTIVE_FLAG = 1
+
+NAME_FIELDS = ('full_name', 'first_name', 'last_name')
+
+# nba_api's list of every player (~5,000 of them), compiled into the same format
+ALL_PLAYERS = 'all'
+
+# Written by Validate.py: the pool players whose headshots were checked (e.g. {"playable": [893, ...], "placeholder": [...]})
+PLAYABLE_MANIFEST = os.path.join('Datasets', 'playable_ids.json')
+
+
+def dataset_path(name: str, extension: str = ".bin") -> str:
+    """Return the file path of a dataset (e.g. 'casual' -> 'Datasets/casual_players.bin')."""
+
+    return get_file_path(os.path.join('Datasets', f'{name}_players{extension}'))
+
+
+def padded(size: int) -> int:
+    """Return 'size' rounded up to a multiple of 4 (so the int32 columns after it stay aligned)."""
+
+    return (size + 3) & ~3
+
+
+class PlayerTable:
+    """A memory-mapped '.bin' dataset. Its columns are read-only NumPy views of the file, so nothing is copied.
+
+    It acts like the list of player dicts it was made from (e.g. table[0] -> {'id': 893, 'full_name': ...}), but each
+    dict is only built when it's asked for.
+    """
+
+    ids: np.ndarray         # int32 player IDs
+    flags: np.ndarray       # uint8 flags (see ACTIVE_FLAG)
+    offsets: np.ndarray     # int32 offsets of every name in 'names'
+    names: memoryview       # UTF-8 bytes of every name
+    buffer: mmap.mmap
+
+    def __init__(self, file_path: str):
+        with open(file_path, 'rb') as file:
+            # An empty file can't be memory-mapped
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{file_path} is too small to be a player dataset")
+
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, names_size = HEADER.unpack_from(self.buffer)
+
+        if magic != MAGIC:
+            raise ValueError(f"{file_path} isn't a player dataset")
+        if version != VERSION:
+            raise ValueError(f"{file_path} is version {version}, but only version {VERSION} can be read")
+
+        start = HEADER.size
+        self.ids = np.frombuffer(self.buffer, dtype='<i4', count=count, offset=start)
+
+        start += 4 * count
+        self.flags = np.frombuffer(self.buffer, dtype=np.uint8, count=count, offset=start)
+
+        start += padded(count)
+        self.offsets = np.frombuffer(self.buffer, dtype='<i4', count=3 * count + 1, offset=start)
+
+        start += 4 * (3 * count + 1)
+        self.names = memoryview(self.buffer)[start:start + names_size]
+
+        if len(self.names) != names_size:
+            raise ValueError(f"{file_path} is cut off")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def name(self, index: int, field: int) -> str:
+        """Return one of the names of the player at the given index (0 = full, 1 = first, 2 = last)."""
+
+        start, end = self.offsets[3 * index + field], self.offsets[3 * index + field + 1]
+        return str(self.names[start:end], 'utf-8')
+
+    def __getitem__(self, index: int) -> dict:
+        if not -len(self) <= index < len(self):
+            raise IndexError("player index out of range")
+
+        index %= len(self)
+
+        return {'id': int(self.ids[index]), 'full_name': self.name(index, 0), 'first_name': self.name(index, 1),
+                'last_name': self.name(index, 2), 'is_active': bool(self.flags[index] & ACTIVE_FLAG)}
+
+    def __iter__(self) -> Iterator[dict]:
+        # Turning the columns into lists once is much faster than indexing the NumPy arrays player by player
+        offsets = self.offsets.tolist()
+        names = [str(self.names[start:end], 'utf-8') for start, end in zip(offsets, offsets[1:])]
+
+        for index, (player_id, flags) in enumerate(zip(self.ids.tolist(), self.flags.tolist())):
+            yield {'id': player_id, 'full_name': names[3 * index], 'first_name': names[3 * index + 1],
+                   'last_name': names[3 * index + 2], 'is_active': bool(flags & ACTIVE_FLAG)}
+
+
+def encode_players(player_dicts: list[dict]) -> bytes:
+    """Return the '.bin' file contents of a list of player dicts (kept in the same order)."""
+
+    count = len(player_dicts)
+
+    encoded_names = [player_dict[field].encode('utf-8') for player_dict in player_dicts for field in NAME_FIELDS]
+    offsets = np.zeros(3 * count + 1, dtype='<i4')
+    offsets[1:] = np.cumsum([len(name) for name in encoded_names])
+    names = b''.join(encoded_names)
+
+    ids = np.array([player_dict['id'] for player_dict in player_dicts], dtype='<i4')
+    flags = np.zeros(padded(count), dtype=np.uint8)
+    flags[:count] = [ACTIVE_FLAG if player_dict['is_active'] else 0 for player_dict in player_dicts]
+
+    return HEADER.pack(MAGIC, VERSION, 0, count, len(names)) + ids.tobytes() + flags.tobytes() + offsets.tobytes() + names
+
+
+def write_players(file_path: str, player_dicts: list[dict]) -> None:
+    """Write a list of player dicts to a '.bin' file (atomically, since running games may have it memory-mapped)."""
+
+    with open(file_path + ".tmp", 'wb') as file:
+        file.write(encode_players(player_dicts))
+
+    os.replace(file_path + ".tmp", file_path)
+
+
+def load_players(name: str) -> Optional[PlayerTable]:
+    """Return the memory-mapped '.bin' version of a dataset, or None if it's missing or can't be read."""
+
+    try:
+        return PlayerTable(dataset_path(name))
+    except (OSError, ValueError):
+        return None
+
+
+def load_pool(pool: str):
+    """Return a pool's players: the '.bin' version if there is one, or the list of dicts in its JSON file."""
+
+    table = load_players(pool)
+    if table is not None:
+        return table
+
+    with open(dataset_path(pool, ".json"), 'r') as file:
+        return json.load(file)
+
+
+def load_playable_manifest() -> Optional[dict[str, set[int]]]:
+    """Return the sets of 'playable' & 'placeholder' player IDs found by Validate.py, or None if it hasn't been run."""
+
+    try:
+        with open(get_file_path(PLAYABLE_MANIFEST), 'r') as file:
+            manifest = json.load(file)
+
+        return {'playable': set(manifest['playable']), 'placeholder': set(manifest['placeholder'])}
+
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_playable_manifest(playable: set[int], placeholder: set[int]) -> None:
+    """Write the IDs of the pool players with a real headshot & with a placeholder (atomically)."""
+
+    file_path = get_file_path(PLAYABLE_MANIFEST)
+
+    with open(file_path + ".tmp", 'w') as file:
+        json.dump({'playable': sorted(playable), 'placeholder': sorted(placeholder)}, file)
+
+    os.replace(file_path + ".tmp", file_path)
+
+
+def convert_datasets() -> None:
+    """Compile the JSON pools & nba_api's list of every player into '.bin' files."""
+
+    from nba_api.stats.static import players
+
+    for pool in ('casual', 'diehard'):
+        with open(dataset_path(pool, ".json"), 'r') as file:
+            write_players(dataset_path(pool), json.load(file))
+
+    # Sorted by ID, like the player registry (see Backend.PlayerRegistry)
+    write_players(dataset_path(ALL_PLAYERS), sorted(players.get_players(), key=lambda player_dict: player_dict['id']))
+
+
+if __name__ == "__main__":
+    convert_datasets()
+
+    for name in ('casual', 'diehard', ALL_PLAYERS):
+        print(f"{dataset_path(name)}: {len(PlayerTable(dataset_path(name)))} players, "
+              f"{os.path.getsize(dataset_path(name))} bytes")
@@ -1,11 +1,16 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Packs every image (pre-scaled to its on-screen size) & sound into 'assets.bundle', so the .exe ships (and unpacks)
+# one file instead of the 'Audio' & 'Images' folders (see Bundle.py)
+from Bundle import build_bundle
+build_bundle()
+
 
 a = Analysis(
     ['Frontend.py'],
     pathex=[],
     binaries=[],
-    datas=[('Audio', 'Audio'), ('Images', 'Images'), ('Datasets', 'Datasets')],
+    datas=[('assets.bundle', '.'), ('Datasets', 'Datasets')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,531 @@
+"""This file will contain the pipeline that rebuilds the CASUAL & DIEHARD player pools from the NBA's season stats."""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
+import pandas as pd
+import requests
+from nba_api.stats.endpoints import leagueleaders
+from Installer import get_file_path, get_cache_path
+
+
+# Seasons that the pools are built from (e.g. 1990 is the 1990-91 season), up to the current one
+FIRST_YEAR = 1990
+
+# The last season of the pools shipped before the manifest existed (see load_manifest())
+LAST_YEAR = 2024
+
+# The first season in the NBA's stats (the BAA's 1946-47 season), so career totals cover every season a player played
+CAREER_FIRST_YEAR = 1946
+
+# stats.nba.com starts refusing requests if they come in too fast, so the workers share a limit
+WORKERS = 4
+REQUESTS_PER_SECOND = 1.0
+
+# Number of times a season is requested before giving up, and the wait (in seconds) after the first failure
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 2.0
+
+
+class TokenBucket:
+    """A thread-safe rate limiter: each request takes a token, and tokens refill at 'rate' per second."""
+
+    rate: float
+    capacity: float
+    tokens: float
+    last_refill: float
+    lock: threading.Lock
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until a token is available, then take it."""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def season_name(year: int) -> str:
+    """Return the name of the season starting in 'year' (e.g. 1995 -> '1995-96')."""
+
+    return f"{year}-{str(year + 1)[-2:]}"
+
+
+def write_json(file_path: str, data) -> None:
+    """Write 'data' to a JSON file atomically, so the game never sees a half-written file."""
+
+    with open(file_path + ".tmp", "w") as file:
+        json.dump(data, file)
+    os.replace(file_path + ".tmp", file_path)
+
+
+def checkpoint_path(season: str) -> str:
+    """Return the file path that a season's table is saved to once it's fetched."""
+
+    return get_cache_path(os.path.join("seasons", f"{season}.json"))
+
+
+def load_season_table(season: str, run: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Return a season's table saved by a previous run, or None if it hasn't been fetched yet (or was saved before the
+    season ended).
+
+    If 'run' is given, only a table saved by that run is returned (see start_run()).
+    """
+
+    try:
+        with open(checkpoint_path(season), 'r') as file:
+            saved = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if run is not None and saved.get('run') != run:
+        return None
+
+    # A season saved while it was still being played (e.g. 2025-26, saved in February 2026) is fetched again
+    saved_during = saved.get('current_season')
+
+    # Checkpoints from before 'current_season' was saved could hold last season from before it ended
+    if saved_during is None:
+        finished = int(season[:4]) < current_season_year() - 1
+    else:
+        finished = saved_during > season
+
+    if not finished:
+        return None
+
+    return pd.DataFrame(saved['rows'], columns=saved['headers'])
+
+
+def save_season_table(season: str, table: pd.DataFrame, run: Optional[str] = None) -> None:
+    """Save a season's table to disk, so a later run doesn't need to fetch it again."""
+
+    os.makedirs(os.path.dirname(checkpoint_path(season)), exist_ok=True)
+
+    # Saved in the same 'headers' & 'rows' layout as stats.nba.com's responses, along with the season that was being
+    # played when it was fetched (so a later run knows whether the table was final)
+    write_json(checkpoint_path(season), {'headers': table.columns.tolist(), 'rows': table.values.tolist(),
+                                         'current_season': season_name(current_season_year()), 'run': run})
+
+
+def run_path(kind: str) -> str:
+    """Return the file path that records the unfinished run of the given kind (e.g. "full")."""
+
+    return get_cache_path(os.path.join("seasons", f"{kind}_run.json"))
+
+
+def start_run(kind: str) -> str:
+    """Return the ID of a new run of the given kind, or of the last one if it was interrupted (so it picks up where it
+    stopped).
+
+    Runs that rebuild the pools from scratch only reuse the seasons saved by their own run, so an old checkpoint never
+    ends up in a fresh build.
+    """
+
+    try:
+        with open(run_path(kind), 'r') as file:
+            run = json.load(file)['run']
+
+        print(f"Resuming the unfinished {kind} run from {run}")
+        return run
+
+    except (OSError, ValueError, KeyError):
+        pass
+
+    run = datetime.now().isoformat()
+
+    os.makedirs(os.path.dirname(run_path(kind)), exist_ok=True)
+    write_json(run_path(kind), {'run': run})
+
+    return run
+
+
+def finish_run(kind: str) -> None:
+    """Forget the run of the given kind, so the next one starts from scratch."""
+
+    try:
+        os.remove(run_path(kind))
+    except OSError:
+        pass
+
+
+def fetch_season_table(season: str, bucket: TokenBucket) -> pd.DataFrame:
+    """Return the season's table of TOTAL POINTS leaders, retrying with a growing wait if the request fails."""
+
+    for attempt in range(MAX_ATTEMPTS):
+        bucket.acquire()
+
+        try:
+            stat_leaders = leagueleaders.LeagueLeaders(season=season)
+            return stat_leaders.get_data_frames()[0]
+
+        # nba_api raises ValueError/KeyError when stats.nba.com sends back something that isn't the expected JSON
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+
+            # Waits 2, 4, 8, ... seconds (plus a bit of randomness, so the workers don't retry in lockstep)
+            time.sleep(BACKOFF_SECONDS * 2 ** attempt + random.uniform(0, 1))
+
+
+def fetch_seasons(years: Iterable[int], workers: int = WORKERS, rate: float = REQUESTS_PER_SECOND,
+                  run: Optional[str] = None) -> dict[str, pd.DataFrame]:
+    """Return the table of every season in 'years', fetching the ones that weren't saved by a previous run (or were
+    saved before they ended, e.g. the current season, whose stats are still changing).
+
+    If 'run' is given, only the seasons saved by that run are reused (see start_run()).
+    """
+
+    tables = {}
+    missing = []
+
+    for year in years:
+        season = season_name(year)
+        table = load_season_table(season, run)
+
+        if table is None:
+            missing.append(season)
+        else:
+            tables[season] = table
+
+    bucket = TokenBucket(rate)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(fetch_and_save_season, season, bucket, run): season for season in missing}
+
+    # Each season is saved by its worker as soon as it arrives, so a failure only loses the seasons not fetched yet
+    try:
+        for done, future in enumerate(as_completed(futures), start=1):
+            season = futures[future]
+            tables[season] = future.result()
+
+            print(f"Fetched {season} ({done}/{len(missing)})")
+
+    finally:
+        # After a failure, the seasons that haven't started are dropped, and the ones already downloading are waited
+        # for (so they're saved) before the error is raised
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return tables
+
+
+def fetch_and_save_season(season: str, bucket: TokenBucket, run: Optional[str] = None) -> pd.DataFrame:
+    """Fetch a season's table & save it straight away, so a failure elsewhere can't lose it."""
+
+    table = fetch_season_table(season, bucket)
+    save_season_table(season, table, run)
+
+    return table
+
+
+def casual_ids(table: pd.DataFrame) -> list[int]:
+    """Return the IDs of the top 10 leaders in TOTAL POINTS (e.g. [1628983, 1630162, 203999, ...])."""
+
+    return table.iloc[:10]["PLAYER_ID"].tolist()
+
+
+def diehard_ids(table: pd.DataFrame) -> list[int]:
+    """Return the IDs of the players ranked in the MIDDLE tier on the total scoring list.
+
+    (e.g. If 500 players played in a particular season, we'd get the players ranking from 245 to 255)
+    """
+
+    mid_index = len(table) // 2
+    return table.iloc[mid_index - 5: mid_index + 5]['PLAYER_ID'].tolist()
+
+
+# How each pool picks its players out of a season's table
+POOL_RULES = {'casual': casual_ids, 'diehard': diehard_ids}
+
+
+def build_pool(pool: str, tables: dict[str, pd.DataFrame]) -> list[dict]:
+    """Return the list of player dicts in the given pool, going through the seasons in order."""
+
+    from Backend import create_player_with_id
+
+    player_pool = []
+
+    for season in sorted(tables):
+        # Turns a list of IDs into a list of player dictionaries
+        # (e.g. [955, ...] -> [{'id': 955, 'full_name': 'Samaki Walker', ...}, ...]
+        player_pool.extend(create_player_with_id(id_num) for id_num in POOL_RULES[pool](tables[season]))
+
+    return player_pool
+
+
+def career_totals(tables: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Return every player's career totals, from ONE group-by over all the season tables.
+
+    The result has a row per player ID, with the columns PTS, GP & LAST_SEASON (e.g. 1995 for the 1995-96 season).
+    """
+
+    seasons = pd.concat([table[['PLAYER_ID', 'PTS', 'GP']].assign(LAST_SEASON=int(season[:4]))
+                         for season, table in tables.items()], ignore_index=True)
+
+    return seasons.groupby('PLAYER_ID').agg(PTS=('PTS', 'sum'), GP=('GP', 'sum'), LAST_SEASON=('LAST_SEASON', 'max'))
+
+
+def categorize_players(totals: pd.DataFrame) -> pd.Series:
+    """Return the category ('casual', 'diehard' or None) of every player in the career totals, using the same rules as
+    NBAPlayer.categorize_player() on all of them at once."""
+
+    from Backend import category_rules
+
+    is_casual, is_diehard = category_rules(totals['PTS'], totals['GP'], totals['LAST_SEASON'])
+
+    categories = pd.Series([None] * len(totals), index=totals.index, dtype=object)
+    categories[is_diehard] = 'diehard'
+    categories[is_casual] = 'casual'     # CASUAL wins for players who fit both
+
+    return categories
+
+
+def store_career_totals(totals: pd.DataFrame, complete: bool) -> None:
+    """Fill the career store with every player's totals at once, so categorize_player() never has to fetch them.
+
+    If the tables cover every season ('complete'), the players that nba_api knows about but who aren't in any of them
+    never played an official game, and are stored as None.
+    """
+
+    from Backend import career_store, player_registry
+
+    stored = {player_id: [points, games, last_season] for player_id, points, games, last_season in
+              zip(totals.index.tolist(), totals['PTS'].tolist(), totals['GP'].tolist(), totals['LAST_SEASON'].tolist())}
+
+    if complete:
+        for player_id in player_registry.ids.tolist():
+            stored.setdefault(player_id, None)
+
+    career_store.put_many(stored)
+
+
+# How the players of each category are ordered in their pool (the first 'size' of them are kept)
+# CASUAL players go by career points (the most famous first), and DIEHARD players by how recently they played
+POOL_ORDER = {'casual': ['PTS'], 'diehard': ['LAST_SEASON', 'GP']}
+
+
+def categorized_pool(pool: str, totals: pd.DataFrame, categories: pd.Series, size: Optional[int] = None) -> list[dict]:
+    """Return the player dicts of every player in the pool's category, in the pool's order (only the first 'size')."""
+
+    from Backend import create_player_with_id
+
+    members = totals[categories == pool].sort_values(POOL_ORDER[pool], ascending=False)
+
+    # merge_players() skips the IDs that nba_api doesn't know about
+    return merge_players([create_player_with_id(player_id) for player_id in members.index.tolist()])[:size]
+
+
+def pool_path(pool: str) -> str:
+    """Return the file path of the given pool's JSON file."""
+
+    return get_file_path(os.path.join('Datasets', f'{pool}_players.json'))
+
+
+def merge_players(*player_lists: list[dict]) -> list[dict]:
+    """Return the players from all the lists in order, keeping only the first dict of each player ID."""
+
+    merged = {}
+
+    for player_list in player_lists:
+        for player_dict in player_list:
+            # create_player_with_id() returns None for IDs that nba_api doesn't know about
+            if player_dict is not None:
+                merged.setdefault(player_dict['id'], player_dict)
+
+    return list(merged.values())
+
+
+def write_pool(pool: str, player_pool: list[dict]) -> None:
+    """Store the given pool into its permanent JSON file & its compiled .bin file (without duplicate players)."""
+
+    from PlayerData import dataset_path, write_players
+
+    player_pool = merge_players(player_pool)
+    write_json(pool_path(pool), player_pool)
+    write_players(dataset_path(pool), player_pool)
+
+
+# Records which seasons each pool was built from, how its players were picked, and which of its seasons hadn't ended
+# when they were added (e.g. {"casual": ["1990-91", ...], "diehard": [...],
+# "built_by": {"casual": "seasons", "diehard": "categorize"}, "unfinished": {"casual": ["2025-26"], ...}})
+MANIFEST_PATH = os.path.join('Datasets', 'pool_seasons.json')
+
+# The ways a pool can be built: each season's scorers (rebuild_pools()), or the categorize rules
+# (rebuild_categorized_pools())
+SEASONS = "seasons"
+CATEGORIZE = "categorize"
+
+
+def load_manifest() -> dict:
+    """Return the seasons that each pool was built from, how each pool was built (under 'built_by') & which of its
+    seasons hadn't ended yet (under 'unfinished')."""
+
+    try:
+        with open(get_file_path(MANIFEST_PATH), 'r') as file:
+            manifest = json.load(file)
+
+    # Pools from before the manifest existed were always built from FIRST_YEAR to LAST_YEAR
+    except OSError:
+        seasons = [season_name(year) for year in range(FIRST_YEAR, LAST_YEAR + 1)]
+        manifest = {'casual': seasons, 'diehard': list(seasons)}
+
+    # Pools from before 'built_by' was recorded were always built from each season's scorers
+    manifest.setdefault('built_by', {})
+    for pool in POOL_RULES:
+        manifest['built_by'].setdefault(pool, SEASONS)
+
+    # Before 'unfinished' was recorded, any pool's newest season could have been added before it ended
+    manifest.setdefault('unfinished', {})
+    for pool in POOL_RULES:
+        manifest['unfinished'].setdefault(pool, sorted(manifest[pool])[-1:])
+
+    return manifest
+
+
+def current_season_year() -> int:
+    """Return the year that the current (or most recent) season started in."""
+
+    # A season starts in October (e.g. in March 2025, the current season is still 2024-25)
+    today = date.today()
+    return today.year if today.month >= 10 else today.year - 1
+
+
+def unfinished_seasons(tables: dict[str, pd.DataFrame]) -> list[str]:
+    """Return which of the fetched seasons are still being played (i.e. the current season, if it was fetched)."""
+
+    return [season for season in sorted(tables) if season >= season_name(current_season_year())]
+
+
+def rebuild_pools(pools: tuple = ('casual', 'diehard'), first_year: int = FIRST_YEAR, last_year: Optional[int] = None,
+                  workers: int = WORKERS, rate: float = REQUESTS_PER_SECOND) -> None:
+    """Rebuild the given pools, from ONE shared fetch of each season's table (up to the current season by default)."""
+
+    last_year = current_season_year() if last_year is None else last_year
+
+    # Every season is downloaded again, unless an interrupted --full run already saved it
+    run = start_run("full")
+    tables = fetch_seasons(range(first_year, last_year + 1), workers, rate, run)
+    manifest = load_manifest()
+
+    for pool in pools:
+        write_pool(pool, build_pool(pool, tables))
+        manifest[pool] = sorted(tables)
+        manifest['built_by'][pool] = SEASONS
+        manifest['unfinished'][pool] = unfinished_seasons(tables)
+
+    write_json(get_file_path(MANIFEST_PATH), manifest)
+    finish_run("full")
+
+
+def refresh_pools(pools: tuple = ('casual', 'diehard'), workers: int = WORKERS,
+                  rate: float = REQUESTS_PER_SECOND) -> None:
+    """Add the newest seasons to the given pools, only fetching the seasons they're missing (plus the current one)."""
+
+    manifest = load_manifest()
+
+    # Adding a season's scorers to a pool picked by the categorize rules would mix the two kinds of players
+    categorized = [pool for pool in pools if manifest['built_by'][pool] == CATEGORIZE]
+    if categorized:
+        names = ' & '.join(pool.upper() for pool in categorized)
+        raise ValueError(f"{names} {'was' if len(categorized) == 1 else 'were'} built from the categorize rules, so "
+                         f"only 'python Rebuild.py --categorize' can rebuild {'it' if len(categorized) == 1 else 'them'}")
+
+    current_year = current_season_year()
+    current_season = season_name(current_year)
+
+    # A season that hadn't ended when it was added (e.g. the current one, whose stats change every day) is fetched
+    # again, so the pool gets its final scorers
+    wanted = {season_name(year): year for year in range(FIRST_YEAR, current_year + 1)}
+    missing = {pool: {season for season in wanted
+                      if season not in manifest[pool] or season in manifest['unfinished'][pool]
+                      or season == current_season}
+               for pool in pools}
+
+    # Each season is fetched once, even if several pools are missing it
+    years = sorted({wanted[season] for seasons in missing.values() for season in seasons})
+    tables = fetch_seasons(years, workers, rate)
+
+    for pool in pools:
+        with open(pool_path(pool), 'r') as file:
+            old_pool = json.load(file)
+
+        # Each pool only gets the seasons IT was missing, and their players are added after the existing ones
+        # (skipping anyone already in the pool)
+        pool_tables = {season: tables[season] for season in missing[pool]}
+        write_pool(pool, merge_players(old_pool, build_pool(pool, pool_tables)))
+        manifest[pool] = sorted(set(manifest[pool]) | set(pool_tables))
+        manifest['unfinished'][pool] = unfinished_seasons(pool_tables)
+
+    write_json(get_file_path(MANIFEST_PATH), manifest)
+
+
+def rebuild_categorized_pools(pools: tuple = ('casual', 'diehard'), size: Optional[int] = None,
+                              workers: int = WORKERS, rate: float = REQUESTS_PER_SECOND) -> None:
+    """Rebuild the given pools from the categorize rules, applied to EVERY player's career totals at once.
+
+    Every season since CAREER_FIRST_YEAR is fetched once (~80 requests, saved so an interrupted run can pick up where
+    it stopped), instead of one request per player.
+    """
+
+    # Every season is downloaded again (so the career totals are up to date), unless an interrupted run already saved it
+    run = start_run("categorize")
+    tables = fetch_seasons(range(CAREER_FIRST_YEAR, current_season_year() + 1), workers, rate, run)
+
+    totals = career_totals(tables)
+    store_career_totals(totals, complete=True)
+    categories = categorize_players(totals)
+
+    player_pools = {pool: categorized_pool(pool, totals, categories, size) for pool in pools}
+
+    # An empty pool would leave the game without players for that mode, so the old pools are kept instead
+    for pool, player_pool in player_pools.items():
+        if not player_pool:
+            raise ValueError(f"No players fit the {pool.upper()} rules, so the pools weren't changed")
+
+    manifest = load_manifest()
+
+    for pool, player_pool in player_pools.items():
+        write_pool(pool, player_pool)
+        manifest[pool] = sorted(tables)
+        manifest['built_by'][pool] = CATEGORIZE
+        manifest['unfinished'][pool] = unfinished_seasons(tables)
+
+    write_json(get_file_path(MANIFEST_PATH), manifest)
+    finish_run("categorize")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the CASUAL & DIEHARD player pools")
+    parser.add_argument("--full", action="store_true", help="rebuild the pools from scratch (top & middle scorers)")
+    parser.add_argument("--categorize", action="store_true", help="rebuild the pools from the categorize rules")
+    parser.add_argument("--size", type=int, default=None, help="players per pool (with --categorize)")
+    args = parser.parse_args()
+
+    # 'python Rebuild.py' refreshes the pools with the newest seasons, while 'python Rebuild.py --full' rebuilds them
+    if args.categorize:
+        rebuild_categorized_pools(size=args.size)
+    elif args.full:
+        rebuild_pools()
+    else:
+        refresh_pools()
@@ -0,0 +1,239 @@
+"""This file will contain a local stand-in for stats.nba.com & cdn.nba.com, which records & replays their responses.
+
+In "record" mode, every request is forwarded to the NBA's servers & the response is saved into the fixture folder.
+In "replay" mode, requests are only answered from the fixture folder, so the game (and its benchmarks) can run
+without a network connection. Both modes can add latency & errors, to see how the game copes with a slow connection.
+
+Usage:  python Replay.py record    (then play the game with HOOPSTER_STAND_IN=http://127.0.0.1:8765)
+        python Replay.py replay --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit, urlencode
+import requests
+from Installer import get_cache_path
+
+
+DEFAULT_PORT = 8765
+
+# Path prefix on the stand-in -> the NBA server that it stands in for
+UPSTREAMS = {'/stats/': 'https://stats.nba.com', '/headshots/': 'https://cdn.nba.com'}
+
+
+def fixture_key(path: str) -> str:
+    """Return the name that a request's fixture is saved under (the same request always gets the same name)."""
+
+    # nba_api doesn't always send its parameters in the same order, so they're sorted first
+    parts = urlsplit(path)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    return hashlib.sha1(f"{parts.path}?{query}".encode()).hexdigest()
+
+
+class FixtureStore:
+    """A folder of recorded responses: '<key>.json' holds a response's status & headers, and '<key>.body' its bytes."""
+
+    folder: str
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder = folder or os.environ.get("HOOPSTER_FIXTURES", get_cache_path("fixtures"))
+        os.makedirs(self.folder, exist_ok=True)
+
+    def load(self, path: str) -> Optional[tuple[int, dict, bytes]]:
+        """Return the recorded (status, headers, body) of a request, or None if it was never recorded."""
+
+        key = fixture_key(path)
+
+        try:
+            with open(os.path.join(self.folder, key + ".json"), 'r') as file:
+                meta = json.load(file)
+            with open(os.path.join(self.folder, key + ".body"), 'rb') as file:
+                body = file.read()
+        except OSError:
+            return None
+
+        return meta['status'], meta['headers'], body
+
+    def save(self, path: str, status: int, headers: dict, body: bytes) -> None:
+        """Record the response of a request."""
+
+        key = fixture_key(path)
+
+        # The body is written first, so a fixture's .json file only exists once it's complete
+        with open(os.path.join(self.folder, key + ".body"), 'wb') as file:
+            file.write(body)
+        with open(os.path.join(self.folder, key + ".json"), 'w') as file:
+            json.dump({'path': path, 'status': status, 'headers': headers}, file)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """The local HTTP server that stands in for the NBA's servers."""
+
+    daemon_threads = True
+
+    mode: str               # "record" or "replay"
+    store: FixtureStore
+    latency: float          # Seconds added to every response
+    jitter: float           # Up to this many extra seconds are added at random
+    error_rate: float       # Chance of a request failing with a 503 error
+    rng: random.Random
+    rng_lock: threading.Lock
+    stats: dict             # Connections opened, requests answered & body bytes sent (to check the client reuses them)
+
+    def __init__(self, port: int = DEFAULT_PORT, mode: str = "replay", store: Optional[FixtureStore] = None,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = 0):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.mode = mode
+        self.store = store or FixtureStore()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+        # A fixed seed makes the injected delays & errors the same on every run
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats = {'connections': 0, 'requests': 0, 'body_bytes': 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StandInServer":
+        """Serve requests from a background thread."""
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers a single request sent to the stand-in."""
+
+    server: StandInServer
+
+    # HTTP/1.1 keeps the connection open between requests, like the NBA's servers do
+    protocol_version = "HTTP/1.1"
+
+    # Sending each response as soon as it's written (otherwise a kept-open connection waits ~40 ms on every response)
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+
+        with self.server.rng_lock:
+            self.server.stats['connections'] += 1
+
+    def do_GET(self) -> None:
+        with self.server.rng_lock:
+            delay = self.server.latency + self.server.rng.uniform(0, self.server.jitter)
+            fail = self.server.rng.random() < self.server.error_rate
+
+        time.sleep(delay)
+
+        if fail:
+            self.reply(503, {'Content-Type': 'text/plain'}, b"Injected error")
+            return
+
+        response = self.server.store.load(self.path)
+
+        if response is None and self.server.mode == "record":
+            response = self.record()
+
+        if response is None:
+            self.reply(404, {'Content-Type': 'text/plain'}, b"No fixture recorded for this request")
+            return
+
+        status, headers, body = response
+
+        if status == 200 and self.path.startswith('/headshots/'):
+            # Like the CDN, every headshot gets an ETag (a hash of the image, if none was recorded)
+            recorded = {name.lower(): value for name, value in headers.items()}
+            etag = recorded.get('etag') or f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            headers = {**headers, 'ETag': etag}
+
+            # Answering conditional requests for headshots the client already has with '304 Not Modified'
+            not_modified = (self.headers.get('If-None-Match') == etag or
+                            self.headers.get('If-Modified-Since', object()) == recorded.get('last-modified'))
+
+            if not_modified:
+                self.reply(304, {'ETag': etag}, b"")
+                return
+
+        self.reply(status, headers, body)
+
+    def record(self) -> Optional[tuple[int, dict, bytes]]:
+        """Forward the request to the NBA's server it's meant for, and save the response."""
+
+        for prefix, upstream in UPSTREAMS.items():
+            if self.path.startswith(prefix):
+                break
+        else:
+            return None
+
+        # stats.nba.com only answers requests that look like they came from a browser
+        from nba_api.stats.library.http import STATS_HEADERS
+        headers = STATS_HEADERS if prefix == '/stats/' else {}
+
+        upstream_response = requests.get(upstream + self.path, headers=headers, timeout=30)
+
+        # requests has already un-gzipped the body, so only the headers that still apply are kept
+        kept_headers = {name: value for name, value in upstream_response.headers.items()
+                        if name.lower() in {'content-type', 'etag', 'last-modified'}}
+        response = upstream_response.status_code, kept_headers, upstream_response.content
+
+        # Errors from the NBA's servers aren't worth replaying
+        if upstream_response.status_code == 200:
+            self.server.store.save(self.path, *response)
+
+        return response
+
+    def reply(self, status: int, headers: dict, body: bytes) -> None:
+        """Send a response back to the client."""
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        with self.server.rng_lock:
+            self.server.stats['requests'] += 1
+            self.server.stats['body_bytes'] += len(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Printing every request would slow the benchmarks down
+        pass
+
+
+def use_stand_in(base_url: str) -> str:
+    """Point nba_api at the stand-in, and return the headshot URL template to use with it."""
+
+    from nba_api.stats.library.http import NBAStatsHTTP
+    NBAStatsHTTP.base_url = base_url + "/stats/{endpoint}"
+
+    return base_url + "/headshots/nba/latest/260x190/{player_id}.png"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for stats.nba.com & cdn.nba.com")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--fixtures", default=None, help="folder of recorded responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="chance of a request failing with a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInServer(args.port, args.mode, FixtureStore(args.fixtures), args.latency, args.jitter,
+                           args.error_rate, args.seed)
+    print(f"Serving {args.mode} on {server.url} (fixtures in {server.store.folder})")
+    server.serve_forever()
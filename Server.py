@@ -0,0 +1,553 @@
+"""This file will contain the game server, which runs many games at once over local HTTP & WebSocket (asyncio only).
+
+Every session has its own GameEngine (score & round flow), decks & used players, while all of them share Backend's
+player registry, headshot cache & list of invalid headshots. Headshots are fetched in a thread pool, and sessions
+asking for the same player at the same time share ONE fetch.
+
+HTTP (JSON bodies & replies):
+    POST   /sessions                    Start a session                 -> {"session": "...", "state": "intro", ...}
+    GET    /sessions/<id>               The session's state, question & score
+    POST   /sessions/<id>/mode          {"mode": "casual"}              -> the first question
+    POST   /sessions/<id>/answer        {"choice": 2}                   -> whether it was correct & the new score
+    POST   /sessions/<id>/next          The next question (after an answer)
+    POST   /sessions/<id>/switch        Switch modes (skips to a question in the new mode)
+    DELETE /sessions/<id>               End the session                 -> the final score
+    GET    /headshots/<player_id>.png   A dealt player's headshot
+
+WebSocket:  /ws?session=<id> (or a new session if it's left out), sending {"action": "answer", "choice": 2} etc.
+            (the actions are the same as the HTTP paths above, plus "state" & "quit")
+
+Usage:  python Server.py --port 8080
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import secrets
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+import requests
+import Backend
+from Backend import (NBAPlayer, PlayerDeck, draw_unused_player, release_player, discard_invalid_player,
+                     get_options)
+from Engine import GameEngine, INTRO, PICK_MODE, QUESTION, ANSWER, QUIT, MODES, other_mode
+
+
+DEFAULT_PORT = 8080
+
+# Threads that fetch headshots (the event loop itself never waits on the network or the disk)
+FETCH_WORKERS = 16
+
+# Sessions that haven't sent anything for this many seconds are ended
+SESSION_TIMEOUT = 30 * 60
+
+# Biggest request/message body that's accepted (in bytes)
+MAX_BODY_BYTES = 64 * 1024
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+               413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway"}
+
+
+class RequestError(Exception):
+    """An error that's sent back to the client as {"error": message}, with the given HTTP status."""
+
+    status: int
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class HeadshotFetcher:
+    """Fetches headshots in a thread pool, sharing ONE in-flight fetch between everyone asking for the same player."""
+
+    executor: ThreadPoolExecutor
+    in_flight: dict         # Player ID -> future of the fetch that's currently running for them
+
+    def __init__(self, workers: int = FETCH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="headshot")
+        self.in_flight = {}
+
+    async def fetch(self, player_id: int) -> Optional[bytes]:
+        """Return the player's headshot, or None if the NBA only has a blank placeholder for them."""
+
+        future = self.in_flight.get(player_id)
+
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, Backend.fetch_headshot, player_id)
+            self.in_flight[player_id] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(player_id, None))
+
+        # shield() stops one session's cancelled request from cancelling the fetch for everyone else
+        return await asyncio.shield(future)
+
+    async def cached(self, player_id: int) -> Optional[bytes]:
+        """Return a headshot that's already in the cache (read from disk in the thread pool), or None."""
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, Backend.headshot_cache.get, player_id)
+
+
+class Session:
+    """One player's game: their engine (score & round flow), decks, used players & upcoming questions."""
+
+    session_id: str
+    engine: GameEngine
+    decks: dict[str, PlayerDeck]
+    used: set[int]
+    upcoming: dict          # Mode -> task preparing the mode's next question in the background
+    ready: Optional[tuple]  # The question the engine takes next (see take_ready())
+    last_seen: float
+    lock: asyncio.Lock      # Makes a session's actions run one at a time, even if a client sends several at once
+    fetcher: HeadshotFetcher
+
+    def __init__(self, fetcher: HeadshotFetcher):
+        self.session_id = secrets.token_urlsafe(12)
+        self.engine = GameEngine(self.take_ready)
+        self.decks = {'casual': PlayerDeck(Backend.casual_data, Backend.invalid_ids),
+                      'diehard': PlayerDeck(Backend.diehard_data, Backend.invalid_ids)}
+        self.used = set()
+        self.upcoming = {}
+        self.ready = None
+        self.last_seen = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.fetcher = fetcher
+
+    def take_ready(self, mode: str) -> tuple:
+        """Hand the prepared question to the engine (this is the engine's source of questions)."""
+
+        question, self.ready = self.ready, None
+        return question
+
+    async def prepare_question(self, mode: str) -> tuple[NBAPlayer, list[str]]:
+        """Return a new question for the mode, from this session's decks (like Backend.prepare_question())."""
+
+        while True:
+            player_obj = NBAPlayer(draw_unused_player(self.decks, self.used, mode))
+
+            # The player was never shown, so they go back in the deck
+            try:
+                headshot = await self.fetcher.fetch(player_obj.id)
+            except Exception:
+                release_player(self.decks, self.used, mode, player_obj.id)
+                raise
+
+            if headshot is not None:
+                player_obj.headshot = headshot
+                return player_obj, get_options(player_obj.full_name, player_obj.id)
+
+            discard_invalid_player(self.decks, self.used, player_obj.id)
+
+    async def load_question(self, mode: str) -> None:
+        """Get the mode's next question ready for the engine, then start preparing the one after it."""
+
+        task = self.upcoming.pop(mode, None)
+
+        try:
+            self.ready = await task if task is not None else await self.prepare_question(mode)
+
+        except requests.exceptions.RequestException:
+            # A failed background fetch gets one more try, now that the user is actually waiting for it
+            try:
+                self.ready = await self.prepare_question(mode)
+            except requests.exceptions.RequestException:
+                raise RequestError(502, "The NBA's servers didn't respond properly, try again")
+
+        # The user will most likely answer & ask for another question in the same mode
+        self.upcoming[mode] = asyncio.create_task(self.prepare_question(mode))
+
+    def close(self) -> None:
+        """Stop preparing questions that won't be asked."""
+
+        for task in self.upcoming.values():
+            task.cancel()
+
+            # A task that already failed (e.g. the NBA's servers didn't respond) is never awaited now, so its error is
+            # retrieved here rather than logged as "Task exception was never retrieved"
+            task.add_done_callback(retrieve_exception)
+
+        self.upcoming.clear()
+
+    def state(self) -> dict:
+        """Return the session's state, score & current question as JSON-friendly data."""
+
+        engine = self.engine
+        reply = {'session': self.session_id, 'state': engine.state, 'mode': engine.mode, 'points': engine.points,
+                 'rounds': engine.rounds}
+
+        if engine.state in (QUESTION, ANSWER):
+            reply['question'] = {'player_id': engine.player.id, 'headshot': f"/headshots/{engine.player.id}.png",
+                                 'choices': engine.choices}
+
+        if engine.state == ANSWER:
+            reply['answer'] = {'correct': engine.last_answer_correct, 'player': engine.player.full_name,
+                               'points_change': engine.last_points_change}
+
+        return reply
+
+    async def act(self, action: str, data: dict) -> dict:
+        """Carry out one of the user's actions (e.g. "answer" with {"choice": 2}) and return the new state."""
+
+        async with self.lock:
+            self.last_seen = time.monotonic()
+
+            try:
+                await self.apply(action, data)
+            except ValueError as error:
+                raise RequestError(409, str(error))
+
+            return self.state()
+
+    async def apply(self, action: str, data: dict) -> None:
+        """Move the session's engine along for one action, fetching a question first if the action needs one."""
+
+        engine = self.engine
+
+        if action == "state":
+            pass
+
+        elif action == "mode":
+            if engine.state == INTRO:
+                engine.continue_intro()
+
+            # Checked before anything is fetched, so a bad request doesn't use up a player
+            engine.expect(PICK_MODE)
+            if data.get('mode') not in MODES:
+                raise ValueError(f"Unknown mode: {data.get('mode')}")
+
+            await self.load_question(data['mode'])
+            engine.pick_mode(data['mode'])
+
+        elif action == "answer":
+            choice = data.get('choice')
+            engine.expect(QUESTION)
+
+            if not isinstance(choice, int) or not 0 <= choice < len(engine.choices):
+                raise ValueError(f"'choice' has to be between 0 and {len(engine.choices) - 1}")
+
+            engine.answer(choice)
+
+        elif action == "next":
+            engine.expect(ANSWER)
+            await self.load_question(engine.mode)
+            engine.next_question()
+
+        elif action == "switch":
+            engine.expect(QUESTION)
+            await self.load_question(other_mode(engine.mode))
+            engine.switch_mode()
+
+        elif action == "quit":
+            engine.quit()
+            self.close()
+
+        else:
+            raise RequestError(404, f"Unknown action: {action}")
+
+
+class GameServer:
+    """The HTTP & WebSocket server, holding every session."""
+
+    sessions: dict[str, Session]
+    fetcher: HeadshotFetcher
+    expiry_task: Optional[asyncio.Task]     # Runs expire_sessions() while the server is up
+
+    def __init__(self, workers: int = FETCH_WORKERS):
+        self.sessions = {}
+        self.fetcher = HeadshotFetcher(workers)
+        self.expiry_task = None
+
+        # Loaded once here, rather than by whichever session happens to come first
+        Backend.load_player_data()
+
+    def new_session(self) -> Session:
+        session = Session(self.fetcher)
+        self.sessions[session.session_id] = session
+        return session
+
+    def get_session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+
+        if session is None:
+            raise RequestError(404, "Unknown session")
+
+        return session
+
+    def end_session(self, session_id: str) -> dict:
+        session = self.get_session(session_id)
+        del self.sessions[session_id]
+        session.engine.quit()
+        session.close()
+        return session.state()
+
+    async def expire_sessions(self) -> None:
+        """End the sessions that have gone quiet (runs for as long as the server does)."""
+
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+
+            for session_id, session in list(self.sessions.items()):
+                if now - session.last_seen > SESSION_TIMEOUT:
+                    self.end_session(session_id)
+
+    def dealt_headshot(self, player_id: int) -> Optional[bytes]:
+        """Return the headshot of a player that a session is currently asking about, or None."""
+
+        for session in self.sessions.values():
+            engine = session.engine
+
+            if engine.state in (QUESTION, ANSWER) and engine.player.id == player_id:
+                return engine.player.headshot
+
+        return None
+
+    async def route(self, method: str, path: str, body: dict) -> tuple[int, str, bytes]:
+        """Return the (status, content type, body) of an HTTP request."""
+
+        parts = [part for part in path.split("/") if part]
+
+        if parts == ["sessions"] and method == "POST":
+            return json_reply(200, self.new_session().state())
+
+        if len(parts) == 2 and parts[0] == "sessions":
+            if method == "GET":
+                return json_reply(200, await self.get_session(parts[1]).act("state", {}))
+            if method == "DELETE":
+                return json_reply(200, self.end_session(parts[1]))
+
+        if len(parts) == 3 and parts[0] == "sessions" and method == "POST":
+            if parts[2] not in {"mode", "answer", "next", "switch"}:
+                raise RequestError(404, f"Unknown action: {parts[2]}")
+
+            return json_reply(200, await self.get_session(parts[1]).act(parts[2], body))
+
+        if len(parts) == 2 and parts[0] == "headshots" and parts[1].endswith(".png") and method == "GET":
+            try:
+                player_id = int(parts[1][:-4])
+            except ValueError:
+                raise RequestError(404, "Unknown headshot")
+
+            # A headshot that couldn't be saved to the cache (e.g. its folder is read-only) is still held by the
+            # sessions it was dealt to
+            headshot = await self.fetcher.cached(player_id) or self.dealt_headshot(player_id)
+            if headshot is None:
+                raise RequestError(404, "Unknown headshot")
+
+            return 200, "image/png", headshot
+
+        raise RequestError(404 if method in {"GET", "POST", "DELETE"} else 405, f"No route for {method} {path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer HTTP requests on one connection (kept open between requests), or hand it over to a WebSocket."""
+
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+
+                method, target, headers, raw_body = request
+                url = urlsplit(target)
+
+                if url.path == "/ws" and headers.get('upgrade', '').lower() == "websocket":
+                    await self.handle_websocket(reader, writer, headers, parse_qs(url.query))
+                    break
+
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise ValueError
+                    status, content_type, reply = await self.route(method, url.path, body)
+                except ValueError:
+                    status, content_type, reply = json_reply(400, {'error': "The body has to be a JSON object"})
+                except RequestError as error:
+                    status, content_type, reply = json_reply(error.status, {'error': str(error)})
+
+                keep_alive = headers.get('connection', '').lower() != "close"
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: {content_type}\r\nContent-Length: {len(reply)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + reply)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+
+        except RequestError as error:
+            status, content_type, reply = json_reply(error.status, {'error': str(error)})
+            writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(reply)}\r\nConnection: close\r\n\r\n".encode() + reply)
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def handle_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: dict,
+                               query: dict) -> None:
+        """Play a session over a WebSocket: every text message is an action, and is answered with the new state."""
+
+        key = headers.get('sec-websocket-key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        try:
+            session = self.get_session(query['session'][0]) if 'session' in query else self.new_session()
+        except RequestError as error:
+            send_frame(writer, 0x1, json.dumps({'error': str(error)}).encode())
+            send_frame(writer, 0x8, struct.pack("!H", 1008))
+            await writer.drain()
+            return
+
+        send_frame(writer, 0x1, json.dumps(session.state()).encode())
+        await writer.drain()
+
+        while True:
+            opcode, payload = await read_frame(reader)
+
+            if opcode == 0x8:   # Close
+                send_frame(writer, 0x8, payload[:2])
+                await writer.drain()
+                return
+
+            if opcode == 0x9:   # Ping
+                send_frame(writer, 0xA, payload)
+
+            elif opcode == 0x1:     # Text
+                try:
+                    message = json.loads(payload)
+                    reply = await session.act(message.pop('action', "state"), message)
+
+                    if session.engine.state == QUIT:
+                        self.sessions.pop(session.session_id, None)
+
+                except (ValueError, AttributeError):
+                    reply = {'error': "Messages have to be JSON objects"}
+                except RequestError as error:
+                    reply = {'error': str(error)}
+
+                send_frame(writer, 0x1, json.dumps(reply).encode())
+
+            await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> None:
+        """Run the server until it's stopped."""
+
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+        # Kept on the server, since the event loop only holds a weak reference to its tasks
+        self.expiry_task = asyncio.create_task(self.expire_sessions())
+
+        print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.expiry_task.cancel()
+
+
+def retrieve_exception(task: asyncio.Task) -> None:
+    """Mark a finished task's error (if it had one) as handled."""
+
+    if not task.cancelled():
+        task.exception()
+
+
+def json_reply(status: int, data: dict) -> tuple[int, str, bytes]:
+    """Return an HTTP reply holding 'data' as JSON."""
+
+    return status, "application/json", json.dumps(data).encode()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[tuple[str, str, dict, bytes]]:
+    """Read one HTTP request. Return (method, target, headers, body), or None if the client closed the connection."""
+
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+
+    try:
+        method, target, _ = request_line.decode('latin-1').split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "Malformed request line")
+
+    # Header names are case-insensitive, so they're kept in lower case
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise RequestError(400, "Malformed Content-Length")
+
+    if length < 0:
+        raise RequestError(400, "Malformed Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, "Body too large")
+
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """Read one WebSocket frame from a client. Return its (opcode, unmasked payload)."""
+
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+
+    # Lengths of 126 & 127 mean the real length is in the next 2 or 8 bytes
+    if length == 126:
+        length, = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack("!Q", await reader.readexactly(8))
+
+    if length > MAX_BODY_BYTES:
+        raise ConnectionError("WebSocket message too large")
+
+    # Messages from clients are always masked with a 4-byte key
+    mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+    payload = await reader.readexactly(length)
+
+    return opcode, bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+
+def send_frame(writer: asyncio.StreamWriter, opcode: int, payload: bytes) -> None:
+    """Write one (unmasked, unfragmented) WebSocket frame to a client."""
+
+    if len(payload) < 126:
+        header = struct.pack("!BB", 0x80 | opcode, len(payload))
+    elif len(payload) < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, len(payload))
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, len(payload))
+
+    writer.write(header + payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the game to many players at once")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="threads that fetch headshots")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(GameServer(args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
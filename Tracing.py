@@ -0,0 +1,190 @@
+"""This file will contain the lightweight timing spans used to see where the time goes in each question.
+
+Each stage's most recent timings are kept in memory (for the on-screen overlay & the summary), and tracing is switched on with
+environment variables:
+
+    HOOPSTER_TRACE=trace.jsonl      Write every span to a JSONL file, and print each stage's p50/p95/p99 on exit
+    HOOPSTER_PROFILE=game.prof      Profile the main thread with cProfile (open it with 'python -m pstats game.prof')
+    HOOPSTER_TRACEMALLOC=10         Track memory allocations, and print the 10 biggest allocating lines on exit
+"""
+
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+TRACE_PATH = os.environ.get("HOOPSTER_TRACE")
+PROFILE_PATH = os.environ.get("HOOPSTER_PROFILE")
+TRACEMALLOC_LINES = int(os.environ.get("HOOPSTER_TRACEMALLOC") or 0)
+
+# How many of each stage's latest durations are kept (every one of them is kept when HOOPSTER_TRACE is set, since the
+# summary printed on exit should cover the whole session)
+STAGE_HISTORY = None if TRACE_PATH else 1000
+
+stage_timings = {}      # Stage name -> its latest durations (in ms) (e.g. {'fetch_headshot': deque([3.1, ...])})
+stage_counts = {}       # Stage name -> how many times it ran this session (e.g. {'fetch_headshot': 120})
+question_stages = {}    # Player ID -> stage timings of a question that's been prepared, but not shown yet
+last_question = {}      # Stage timings of the question on screen (e.g. {'get_player': 1.2, 'decode_headshot': 0.4})
+
+trace_lock = threading.Lock()
+trace_file = None
+profiler = None
+tracing_started = False
+
+# Each thread adds its spans to the question it's currently preparing (or None if it isn't preparing one)
+local = threading.local()
+
+
+@contextmanager
+def span(name: str, **fields):
+    """Time the code inside a 'with span("stage name") as timing:' block, and record it as one of the question's stages.
+
+    Once the block ends, timing['duration_ms'] holds how long it took.
+    """
+
+    timing = {}
+    start = time.perf_counter()
+
+    try:
+        yield timing
+    finally:
+        timing['duration_ms'] = (time.perf_counter() - start) * 1000
+        record(name, start, timing['duration_ms'], fields)
+
+
+def record(name: str, start: float, duration: float, fields: dict) -> None:
+    """Add a finished span to the session's timings, the current question's stages & the trace file."""
+
+    stages = getattr(local, 'stages', None)
+
+    with trace_lock:
+        if name not in stage_timings:
+            stage_timings[name] = collections.deque(maxlen=STAGE_HISTORY)
+
+        stage_timings[name].append(duration)
+        stage_counts[name] = stage_counts.get(name, 0) + 1
+
+        # A stage can run more than once per question (e.g. when a placeholder headshot forces another draw)
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + duration
+
+        if trace_file is not None:
+            trace_file.write(json.dumps({'name': name, 'start': start, 'duration_ms': duration,
+                                         'thread': threading.current_thread().name, **fields}) + "\n")
+
+
+def begin_question() -> None:
+    """Start collecting this thread's spans as the stages of a new question."""
+
+    local.stages = {}
+
+
+def end_question(player_id: int) -> None:
+    """Stop collecting this thread's spans, and keep them until the question with this player is shown."""
+
+    with trace_lock:
+        question_stages[player_id] = getattr(local, 'stages', None) or {}
+
+    local.stages = None
+
+
+def show_question(player_id: int, **extra_stages: float) -> None:
+    """Make the given player's question the one shown by the overlay (the main thread's spans are added to it).
+
+    'extra_stages' are timings taken before the question was known (e.g. wait_for_question=12.5).
+    """
+
+    with trace_lock:
+        stages = question_stages.pop(player_id, None) or {}
+
+    last_question.clear()
+    last_question.update(stages)
+    last_question.update(extra_stages)
+    local.stages = last_question
+
+
+def percentile(timings: list[float], fraction: float) -> float:
+    """Return the value below which 'fraction' of the (sorted) timings fall (e.g. 0.95 -> p95)."""
+
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def summary() -> dict[str, dict]:
+    """Return every stage's count & p50/p95/p99 (in ms) from this session (the percentiles only cover the latest
+    STAGE_HISTORY timings)."""
+
+    with trace_lock:
+        timings = {name: sorted(durations) for name, durations in stage_timings.items()}
+        counts = dict(stage_counts)
+
+    return {name: {'count': counts[name], 'p50_ms': percentile(durations, 0.5),
+                   'p95_ms': percentile(durations, 0.95), 'p99_ms': percentile(durations, 0.99)}
+            for name, durations in timings.items()}
+
+
+def print_summary() -> None:
+    """Print the stage summary (runs on exit when HOOPSTER_TRACE is set)."""
+
+    global trace_file
+
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in sorted(summary().items()):
+        print(f"{name:<24}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+    with trace_lock:
+        trace_file.close()
+        trace_file = None
+
+
+def stop_profiling() -> None:
+    """Save the cProfile results & print the biggest allocations (runs on exit)."""
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(PROFILE_PATH)
+        print(f"Profile saved to {PROFILE_PATH}")
+
+    if TRACEMALLOC_LINES:
+        import tracemalloc
+
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_LINES]:
+            print(stat)
+
+        tracemalloc.stop()
+
+
+def start_tracing(trace_path: Optional[str] = TRACE_PATH) -> None:
+    """Switch on whichever of the trace file, cProfile & tracemalloc were asked for (see the top of this file)."""
+
+    global trace_file, profiler, tracing_started
+
+    # Only start once, even if the game & a benchmark both ask for it
+    if tracing_started:
+        return
+
+    tracing_started = True
+
+    if trace_path:
+        # Line-buffered, so the trace is still useful if the game crashes
+        trace_file = open(trace_path, 'a', buffering=1)
+        atexit.register(print_summary)
+
+    # These are only imported when they're used, since they slow everything down
+    if PROFILE_PATH:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if TRACEMALLOC_LINES:
+        import tracemalloc
+
+        tracemalloc.start()
+
+    if PROFILE_PATH or TRACEMALLOC_LINES:
+        atexit.register(stop_profiling)
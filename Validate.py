@@ -0,0 +1,189 @@
+"""This file will contain the offline check of every pool player's headshot, which writes 'Datasets/playable_ids.json'.
+
+The game only finds out that a player's headshot is a blank placeholder when it downloads it in the middle of a question
+(and has to draw someone else). This checks every player in BOTH pools ahead of time, in parallel, by comparing what's
+in each headshot to the NBA's placeholder silhouette, so the game never deals those players
+(see Backend.load_player_data()).
+
+Usage:  python Validate.py
+        HOOPSTER_STAND_IN=http://127.0.0.1:8765 python Validate.py     (checks the headshots on Replay.py's stand-in)
+"""
+
+import argparse
+import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
+import numpy as np
+import Backend
+from PlayerData import load_pool, load_playable_manifest, write_playable_manifest
+
+
+# The image the NBA's site shows for players without a headshot
+FALLBACK_ID = "fallback"
+
+# Headshots are shrunk to 8x9 pixels to be hashed, so each hash is 64 bits (one per pair of neighbouring pixels)
+HASH_SIZE = 8
+
+# Headshots whose hash is at most this many bits away from the silhouette's are the silhouette (e.g. re-compressed)
+MAX_HASH_DISTANCE = 10
+
+# Headshots whose brightness barely changes (standard deviation, out of 255) are blank
+MIN_PIXEL_STD = 8.0
+
+# Luma weights of the red, green & blue channels
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def grayscale_pixels(image_bytes: bytes) -> np.ndarray:
+    """Return an image's brightness (0-255) as a (height, width) array, with transparent parts shown as white."""
+
+    import pygame
+
+    image = pygame.image.load(io.BytesIO(image_bytes), "headshot.png")
+
+    # The headshots are transparent around the player, so they're drawn onto white (like the game's background)
+    rgb = pygame.surfarray.array3d(image).astype(np.float32)
+    alpha = pygame.surfarray.array_alpha(image).astype(np.float32)[..., None] / 255
+    gray = (rgb * alpha + 255 * (1 - alpha)) @ GRAY_WEIGHTS
+
+    # surfarray arrays are (width, height)
+    return gray.T
+
+
+def difference_hash(gray: np.ndarray) -> int:
+    """Return the 64-bit 'difference hash' of an image: whether each pixel is brighter than its left neighbour, once
+    the image is shrunk to HASH_SIZE x (HASH_SIZE + 1) pixels.
+
+    Two images that look the same (e.g. the same silhouette at another quality) have hashes that only differ by a few bits.
+    """
+
+    height, width = gray.shape
+
+    # Shrinking the image by averaging each block of pixels (np.add.reduceat sums the rows/columns between each edge)
+    row_edges = np.linspace(0, height, HASH_SIZE + 1).astype(int)[:-1]
+    column_edges = np.linspace(0, width, HASH_SIZE + 2).astype(int)[:-1]
+    block_sums = np.add.reduceat(np.add.reduceat(gray, row_edges, axis=0), column_edges, axis=1)
+    block_sizes = np.outer(np.diff(row_edges, append=height), np.diff(column_edges, append=width))
+    small = block_sums / block_sizes
+
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hash_distance(hash_a: int, hash_b: int) -> int:
+    """Return the number of bits that two hashes differ by."""
+
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def is_placeholder(headshot: bytes, silhouette_hash: Optional[int]) -> bool:
+    """Return whether a headshot is a placeholder: tiny, blank, or (once hashed) the same picture as the silhouette."""
+
+    import pygame
+
+    if len(headshot) < Backend.PLACEHOLDER_BYTES:
+        return True
+
+    try:
+        gray = grayscale_pixels(headshot)
+
+    # A headshot that can't be decoded can't be shown either
+    except (pygame.error, ValueError):
+        return True
+
+    if gray.std() < MIN_PIXEL_STD:
+        return True
+
+    return silhouette_hash is not None and hash_distance(difference_hash(gray), silhouette_hash) <= MAX_HASH_DISTANCE
+
+
+def fetch_silhouette_hash() -> Optional[int]:
+    """Return the hash of the NBA's placeholder silhouette, or None if it couldn't be downloaded."""
+
+    import requests
+
+    try:
+        response = Backend.get_http_session().get(Backend.HEADSHOT_URL.format(player_id=FALLBACK_ID),
+                                                  timeout=Backend.HEADSHOT_TIMEOUT)
+        response.raise_for_status()
+        return difference_hash(grayscale_pixels(response.content))
+
+    except requests.exceptions.RequestException as error:
+        print(f"Couldn't download the placeholder silhouette ({error}), so only blank headshots will be caught")
+        return None
+
+
+def check_player(player_id: int, silhouette_hash: Optional[int]) -> Optional[bool]:
+    """Return whether a player's headshot is real (True) or a placeholder (False), or None if it couldn't be downloaded."""
+
+    import requests
+
+    try:
+        # fetch_headshot() also fills the game's headshot cache, and already returns None for tiny placeholders
+        headshot = Backend.fetch_headshot(player_id)
+    except requests.exceptions.RequestException:
+        return None
+
+    if headshot is None:
+        return False
+
+    if is_placeholder(headshot, silhouette_hash):
+        Backend.headshot_cache.mark_invalid(player_id)
+        return False
+
+    return True
+
+
+def pool_ids(pools: Iterable[str] = ('casual', 'diehard')) -> list[int]:
+    """Return the unique player IDs in the given pools."""
+
+    return sorted({player_dict['id'] for pool in pools for player_dict in load_pool(pool)})
+
+
+def validate_pools(pools: Iterable[str] = ('casual', 'diehard'), workers: int = Backend.HTTP_POOL_SIZE) -> dict:
+    """Check every player's headshot in the given pools, and write the IDs of the playable ones to the manifest.
+
+    Players whose headshot couldn't be downloaded keep whatever the previous manifest said about them.
+    """
+
+    player_ids = pool_ids(pools)
+    silhouette_hash = fetch_silhouette_hash()
+
+    previous = load_playable_manifest() or {'playable': set(), 'placeholder': set()}
+    playable, placeholder, unchecked = set(), set(), set()
+
+    # Each check mostly waits on the network, so they run in threads (sharing Backend's pool of kept-open connections)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(check_player, player_id, silhouette_hash): player_id for player_id in player_ids}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            player_id = futures[future]
+            result = future.result()
+
+            if result is None:
+                unchecked.add(player_id)
+            elif result:
+                playable.add(player_id)
+            else:
+                placeholder.add(player_id)
+
+            if done % 100 == 0 or done == len(futures):
+                print(f"Checked {done}/{len(futures)} headshots")
+
+    playable |= unchecked & previous['playable']
+    placeholder |= unchecked & previous['placeholder']
+
+    write_playable_manifest(playable, placeholder)
+
+    return {'playable': playable, 'placeholder': placeholder, 'unchecked': unchecked - playable - placeholder}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every pool player's headshot, and write the playable IDs")
+    parser.add_argument("--workers", type=int, default=Backend.HTTP_POOL_SIZE, help="headshots downloaded at once")
+    args = parser.parse_args()
+
+    results = validate_pools(workers=args.workers)
+
+    print(f"{len(results['playable'])} playable, {len(results['placeholder'])} placeholders, "
+          f"{len(results['unchecked'])} couldn't be checked")